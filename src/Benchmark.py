@@ -0,0 +1,364 @@
+"""
+`Benchmark` class times and measures memory of the processing
+stages of `DataProcessor`, `DataClassifier.load_data`, and
+`DataClassifier.train_and_test_models` for each classifier.
+
+Every benchmark runs in a fresh process on a copy of the raw data
+in a work directory, so the checked-in `data_raw` and
+`data_preprocessed` folders are never modified.  Inputs are scaled
+by adding copies of every team (e.g., "BOSTON CELTICS 2") to the
+raw team box scores and season schedules, which keeps the points
+check of the schedule merge consistent.  With `synthetic=True` the
+inputs are written by `SyntheticDataGenerator` instead, with
+30 teams per unit of scale.
+
+Attributes:
+    run(scales, seasons, classifiers, n_splits, repeats, label,
+        synthetic):
+        Runs all benchmarks for each input scale and appends one JSON
+        line per result to the history file, tagged with the git
+        commit and `label`.  Returns the results as a DataFrame.
+
+    load_history(): Returns the history file as a DataFrame.
+
+    compare(base, head, threshold, metrics): Compares the median
+        results of two commits (or labels) in the history.  Flags
+        benchmarks whose metric grew by more than `threshold`
+        (e.g., 0.1 for 10%).
+
+    Command line:
+        python -m src.Benchmark run --scales 1 10 --seasons 2017 2018
+        python -m src.Benchmark run --synthetic --scales 10 100
+        python -m src.Benchmark compare <base commit> <head commit>
+
+    Requirements:
+        pandas, numpy, DataProcessor and DataClassifier requirements
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import datetime
+import tempfile
+import subprocess
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from .SyntheticDataGenerator import SyntheticDataGenerator
+from .StageInstrumentation import StageInstrumentation, get_usage
+
+
+_processing_stages = ["create_processed_team_box_and_add_season_schedule", \
+                      "add_fgp_tpp_tr_to_processed_team_box", \
+                      "write_complete_processed_team_box"]
+
+
+def _get_dir_size(dir_path):
+    n_files = 0
+    n_bytes = 0
+    for dir_name, sub_dir_names, file_names in os.walk(dir_path):
+        for file_name in file_names:
+            n_files = n_files + 1
+            n_bytes = n_bytes + os.path.getsize(os.path.join(dir_name, file_name))
+    return n_files, n_bytes
+
+
+def _run_case(case):
+    # Runs one benchmark in a fresh process, timing only the benchmarked call
+    from .DataProcessor import DataProcessor
+    from .DataClassifier import DataClassifier
+
+    instrumentation = StageInstrumentation(verbosity=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if case["kind"] == "process":
+            data_processor = DataProcessor(root_dir=case["root_dir"], \
+                                           proc_dir=case["proc_dir"], \
+                                           instrumentation=instrumentation)
+            call = getattr(data_processor, case["stage"])
+        else:
+            data_classifier = DataClassifier(proc_dir=case["proc_dir"], \
+                                             instrumentation=instrumentation)
+            if case["kind"] == "train":
+                data_classifier.load_data()
+                # Trains on every loaded row, as in earlier runs
+                data_classifier.set_feats_and_labels(start_year=None, \
+                                                     skip_playoffs=False)
+                data_classifier.set_train_test_split(n_splits=case["n_splits"])
+                data_classifier.set_classifiers([case["classifier"]])
+                call = lambda: data_classifier.train_and_test_models(\
+                    verbose=False, use_registry=False)
+            else:
+                call = data_classifier.load_data
+
+        cpu_start, rss_setup = get_usage()
+        time_start = time.perf_counter()
+        call()
+        wall_time = time.perf_counter() - time_start
+        cpu_end, rss_peak = get_usage()
+
+    result = {"wall_s": wall_time, \
+              "cpu_s": cpu_end - cpu_start, \
+              "peak_rss_mb": rss_peak, \
+              "setup_rss_mb": rss_setup, \
+              "stage_rss_mb": None}
+    if rss_peak is not None:
+        result["stage_rss_mb"] = rss_peak - rss_setup
+
+    # File and row counts of the benchmarked stage
+    stage_events = [event for event in instrumentation.events \
+                    if event["event"] == "stage" and event["season"] is None]
+    for field in ["files_read", "bytes_read", "files_written", "bytes_written"]:
+        result[field] = stage_events[-1][field]
+    if case["kind"] == "process":
+        result["rows"] = int(data_processor.team_full_df.shape[0])
+        result["out_files"], result["out_bytes"] \
+            = _get_dir_size(data_processor.proc_team_file_path)
+    elif case["kind"] == "load":
+        result["rows"] = int(data_classifier.team_full_df.shape[0])
+    else:
+        result["rows"] = int(data_classifier.X.shape[0])
+    return result
+
+
+class Benchmark:
+    def __init__(self, root_dir = "data_raw", \
+                 history_path = "benchmarks/history.jsonl", work_dir = None):
+        self.root_dir = root_dir
+        self.history_path = history_path
+        self.work_dir = work_dir
+        self.metrics = ["wall_s", "cpu_s", "peak_rss_mb", "stage_rss_mb"]
+
+
+    def run(self, scales = [1], seasons = None, classifiers = None, \
+            n_splits = 3, repeats = 1, label = None, synthetic = False):
+        if classifiers is None:
+            classifiers = ["KNN", "SVC", "NSVC", "DTC", "RFC", "ABC", "GBC", \
+                           "GNB", "LDA", "QDA", "LR"]
+        info = {"commit": self.__get_commit(), \
+                "label": label, \
+                "timestamp": datetime.datetime.now().isoformat(), \
+                "machine": platform.node(), \
+                "python": platform.python_version(), \
+                "n_cpus": os.cpu_count()}
+
+        results = []
+        for scale in scales:
+            for repeat in range(repeats):
+                work_dir_path = tempfile.mkdtemp(prefix="nba_benchmark_", \
+                                                 dir=self.work_dir)
+                try:
+                    root_dir = os.path.join(work_dir_path, "data_raw")
+                    proc_dir = os.path.join(work_dir_path, "data_preprocessed")
+                    if synthetic:
+                        self.__write_synthetic_raw_data(root_dir, scale, \
+                                                        seasons, repeat)
+                    else:
+                        self.__write_scaled_raw_data(root_dir, scale, seasons)
+                    in_files, in_bytes = _get_dir_size(root_dir)
+
+                    # Stages run in pipeline order on the same work directory
+                    cases = [("process", stage, None) \
+                             for stage in _processing_stages] \
+                            + [("load", "load_data", None)] \
+                            + [("train", "train_and_test_models/" + clf_str, \
+                                clf_str) for clf_str in classifiers]
+                    for kind, name, clf_str in cases:
+                        case = {"kind": kind, "stage": name, \
+                                "classifier": clf_str, "n_splits": n_splits, \
+                                "root_dir": root_dir, "proc_dir": proc_dir}
+                        result = dict(info)
+                        result.update({"benchmark": name, "scale": scale, \
+                                       "source": "synthetic" if synthetic \
+                                                 else "real", \
+                                       "repeat": repeat, "in_files": in_files, \
+                                       "in_bytes": in_bytes})
+                        result.update(self.__run_in_new_process(case))
+                        self.__append_history(result)
+                        results.append(result)
+                        print(name + " (scale " + str(scale) + "): " \
+                              + "{:.3f} s, ".format(result["wall_s"]) \
+                              + "{:.1f} MB peak".format(result["peak_rss_mb"] or 0))
+                finally:
+                    shutil.rmtree(work_dir_path, ignore_errors=True)
+
+        return pd.DataFrame(results)
+
+
+    def load_history(self):
+        if not os.path.isfile(self.history_path):
+            return pd.DataFrame()
+        with open(self.history_path) as f:
+            return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+    def compare(self, base, head, threshold = 0.1, metrics = None):
+        if metrics is None:
+            metrics = self.metrics
+        history_df = self.load_history()
+        metrics = [metric for metric in metrics if metric in history_df.columns]
+        base_df = self.__select_run(history_df, base)
+        head_df = self.__select_run(history_df, head)
+
+        # Compares medians over repeats of each benchmark and scale
+        keys = ["benchmark", "source", "scale"]
+        base_df = base_df.groupby(keys)[metrics].median()
+        head_df = head_df.groupby(keys)[metrics].median()
+        comparison = []
+        for key in base_df.index.intersection(head_df.index):
+            for metric in metrics:
+                base_value = base_df.loc[key, metric]
+                head_value = head_df.loc[key, metric]
+                if pd.isna(base_value) or pd.isna(head_value) or base_value <= 0:
+                    continue
+                change = head_value/base_value - 1
+                comparison.append(list(key) + [metric, base_value, head_value, \
+                                               change, change > threshold])
+        return pd.DataFrame(comparison, columns=keys + ["metric", "base", \
+                                                        "head", "change", \
+                                                        "regression"])
+
+
+    def __select_run(self, history_df, run_id):
+        # Matches a commit prefix or a label
+        if history_df.shape[0] == 0:
+            raise ValueError("No benchmark history found at " + self.history_path)
+        idx = history_df["commit"].fillna("").str.startswith(run_id) \
+              | (history_df["label"] == run_id)
+        if not idx.any():
+            raise ValueError("No benchmark results found for " + run_id)
+        run_df = history_df.loc[idx].copy()
+        if "source" not in run_df.columns:
+            run_df["source"] = "real"
+        run_df["source"] = run_df["source"].fillna("real")
+        return run_df
+
+
+    def __run_in_new_process(self, case):
+        # Fresh process per benchmark so peak memory is not shared
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            return executor.submit(_run_case, case).result()
+
+
+    def __write_scaled_raw_data(self, root_dir, scale, seasons):
+        for data_name in ["team_box_scores", "season_schedule"]:
+            os.makedirs(os.path.join(root_dir, data_name))
+        os.makedirs(os.path.join(root_dir, "player_box_scores"))
+
+        # Copies team box scores, adding `scale - 1` copies of each team
+        team_dir_path = os.path.join(self.root_dir, "team_box_scores")
+        for season_str in sorted(os.listdir(team_dir_path)):
+            if seasons is not None and int(season_str[0:4]) not in seasons:
+                continue
+            season_dir_path = os.path.join(team_dir_path, season_str)
+            out_dir_path = os.path.join(root_dir, "team_box_scores", season_str)
+            os.makedirs(out_dir_path)
+            for file_name in os.listdir(season_dir_path):
+                if not file_name.endswith("_team_box_scores.csv"):
+                    continue
+                file_path = os.path.join(season_dir_path, file_name)
+                out_file_path = os.path.join(out_dir_path, file_name)
+                if scale == 1:
+                    shutil.copyfile(file_path, out_file_path)
+                else:
+                    team_df = pd.read_csv(file_path)
+                    self.__scale_teams(team_df, ["team"], scale) \
+                        .to_csv(out_file_path, index=False)
+
+        # Copies schedules with the same team copies
+        sch_dir_path = os.path.join(self.root_dir, "season_schedule")
+        for file_name in sorted(os.listdir(sch_dir_path)):
+            if seasons is not None and int(file_name[0:4]) not in seasons:
+                continue
+            file_path = os.path.join(sch_dir_path, file_name)
+            out_file_path = os.path.join(root_dir, "season_schedule", file_name)
+            if scale == 1:
+                shutil.copyfile(file_path, out_file_path)
+            else:
+                sch_df = pd.read_csv(file_path)
+                self.__scale_teams(sch_df, ["away_team", "home_team"], scale) \
+                    .to_csv(out_file_path, index=False)
+
+
+    def __write_synthetic_raw_data(self, root_dir, scale, seasons, seed):
+        if seasons is None:
+            seasons = [2018]
+        for year in seasons:
+            data_generator = SyntheticDataGenerator(root_dir=root_dir, \
+                                                    n_teams=30*scale, \
+                                                    start_year=year, \
+                                                    write_player_box_scores=False, \
+                                                    seed=seed)
+            with contextlib.redirect_stdout(io.StringIO()):
+                data_generator.generate()
+
+
+    def __scale_teams(self, df, team_cols, scale):
+        scaled_dfs = [df]
+        for idx_copy in range(2, scale + 1):
+            df_copy = df.copy()
+            for col in team_cols:
+                df_copy[col] = df_copy[col] + " " + str(idx_copy)
+            scaled_dfs.append(df_copy)
+        return pd.concat(scaled_dfs, ignore_index=True)
+
+
+    def __append_history(self, result):
+        history_dir_path = os.path.dirname(self.history_path)
+        if history_dir_path != "" and not os.path.exists(history_dir_path):
+            os.makedirs(history_dir_path)
+        with open(self.history_path, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+    def __get_commit(self):
+        try:
+            return subprocess.run(["git", "rev-parse", "HEAD"], \
+                                  capture_output=True, text=True, \
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmarks the data " \
+                                     "pipeline and classifiers.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run")
+    run_parser.add_argument("--scales", type=int, nargs="+", default=[1])
+    run_parser.add_argument("--seasons", type=int, nargs="+", default=None)
+    run_parser.add_argument("--classifiers", nargs="+", default=None)
+    run_parser.add_argument("--n-splits", type=int, default=3)
+    run_parser.add_argument("--repeats", type=int, default=1)
+    run_parser.add_argument("--label", default=None)
+    run_parser.add_argument("--synthetic", action="store_true")
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    for sub_parser in [run_parser, compare_parser]:
+        sub_parser.add_argument("--history", default="benchmarks/history.jsonl")
+        sub_parser.add_argument("--root-dir", default="data_raw")
+    args = parser.parse_args()
+
+    benchmark = Benchmark(root_dir=args.root_dir, history_path=args.history)
+    if args.command == "run":
+        benchmark.run(scales=args.scales, seasons=args.seasons, \
+                      classifiers=args.classifiers, n_splits=args.n_splits, \
+                      repeats=args.repeats, label=args.label, \
+                      synthetic=args.synthetic)
+    else:
+        comparison = benchmark.compare(args.base, args.head, \
+                                       threshold=args.threshold)
+        with pd.option_context("display.width", 120):
+            print(comparison.to_string(index=False))
+        if comparison["regression"].any():
+            print("\nRegressions found.")
+            sys.exit(1)
@@ -3,74 +3,491 @@
 classifying, and evaluating NBA game prediction methods.
 
 Attributes:
-    load_data(): Loads complete preprocessed data set.
+    load_data(columns, start_year, end_year, start_date, end_date):
+        Loads complete preprocessed data set.  Reads the
+        season-partitioned Parquet store when present, loading only
+        the requested columns and the seasons/dates in range.
+        Falls back to `complete_processed_team_box.csv`.  Applies
+        the compact types of `TeamBoxSchema`, so `outcome` is an int8
+        label (1 for win).  Rows are kept in date order with a sorted
+        date index (`date_index`), and `game_date` and `playoffs` are
+        always loaded.  Rows without an outcome are kept, but left
+        out of modeling.
+
+    add_pre_game_features(feature_engine, dropna): Adds rolling
+        pre-game features from `RollingFeatureEngine` (computed from
+        previous games only) to the loaded data and returns their
+        names for `set_feats_and_labels`.  With `dropna`, rows without
+        a previous game in the season are dropped.
+
+    add_matchup_features(matchup_features, dropna): Adds differential
+        and ratio features against each row's opponent from
+        `MatchupFeatures` to the loaded data and returns their names
+        for `set_feats_and_labels`.  With `dropna`, rows without an
+        opponent row or with a zero opponent value are dropped.
+
+    add_player_features(dropna): Adds the team-game player features
+        written by `DataProcessor.aggregate_player_box_scores` to the
+        loaded data, joined on team and game date, and returns their
+        names for `set_feats_and_labels`.  With `dropna`, rows without
+        player features are dropped.
     
     set_feats_and_labels(feats, labels, skip_playoffs,
                          start_year, end_year): 
-        Selects features and labels for modeling. 
+        Selects features and labels for modeling, and the seasons
+        (by start year, `end_year=None` for the current season) and
+        games used by `train_and_test_models` and `save_model`.
+        Seasons are a slice of the sorted date index; with
+        `skip_playoffs` games flagged as playoffs by `DataProcessor`
+        are left out.  Columns added by
+        `add_pre_game_features` and `add_matchup_features` can be
+        selected by name, as can those added by `add_player_features`.
     
-    set_train_test_split(n_splits, test_size, rng_seed): Sets data
-        shuffling parameters.
+    set_train_test_split(n_splits, test_size, rng_seed, cache_splits):
+        Sets data shuffling parameters.  With `cache_splits` the
+        stratified split indices are computed once and stored as
+        int32 arrays in `data_preprocessed/split_cache/`, keyed by
+        row count, label hash, test size and season filter, and
+        reused by every classifier and later run.
     
-    set_classifiers(classifiers): Sets classifiers from scikit-learn.
+    set_classifiers(classifiers): Sets classifiers from scikit-learn,
+        by key of `_classifier_registry`.  Estimator modules are
+        imported when a classifier is first built, and scikit-learn
+        itself only by the methods that fit or score models.
     
-    train_and_test_models(verbose): Trains and tests/evaluates
+    train_and_test_models(verbose, n_jobs): Trains and tests/evaluates
         all classification models.  Shuffles data for 
         cross-validation using StratifiedShuffleSplit 
         (stratified k-fold with shuffling). Logs results.
+        Each (classifier, split) pair is seeded with the split seed,
+        so `n_jobs` > 1 runs them on a process pool with the same
+        results as the serial run (`n_jobs=-1` uses all cores).
+        Features are built once as a float32 matrix with int8 labels
+        (1 for win); workers memory-map it from a `.npy` file and
+        receive only the fold indices.
+        With `use_registry`, fitted models and metrics are stored in
+        `ModelRegistry` (`data_preprocessed/model_registry/`) under a
+        hash of features, labels, data, classifier parameters and
+        split seeds; classifiers found there are not fitted again.
+        Fitted models are kept in `models`, keyed by classifier.
+        Fit and predict times of each classifier are recorded as
+        `classifier` events by `instrumentation`.
+
+    search_hyperparameters(classifiers, param_spaces, factor,
+                           min_rows, scoring, n_jobs, verbose):
+        Searches the parameter space of each classifier key
+        (`param_spaces`, by default the spaces declared in
+        `_param_spaces`) with successive halving: all candidates are
+        scored on a small budget (training rows, or `n_estimators`
+        for ensembles), and the best 1/`factor` go on to a budget
+        `factor` times larger, until one remains at the full budget.
+        Every round runs on the process pool of
+        `train_and_test_models` with the cached folds.  Candidates
+        are ranked by mean `scoring` ("log_loss" or "accuracy") over
+        the folds.  All rounds are kept in `search_results`, the best
+        parameters in `best_params` (used from then on by
+        `train_and_test_models` and `save_model`), and the best
+        configuration's results in `log`.
+
+    backtest_models(classifiers, window, n_train_seasons,
+                    first_test_season, reuse_state, n_jobs, verbose):
+        Walk-forward backtest by season: each test season is scored
+        by a model trained on the seasons before it, all of them
+        (`window="expanding"`) or the last `n_train_seasons`
+        (`window="sliding"`).  Testing starts after `n_train_seasons`
+        seasons or at `first_test_season`.  Seasons are blocks of
+        the date-ordered selected rows.  With `reuse_state`, models
+        that support `partial_fit` are updated with each new season
+        instead of refitted (expanding windows), and those in
+        `_warm_start_classifiers` refit from the previous window's
+        solution; the windows of other classifiers are independent
+        jobs on the process pool of `train_and_test_models`.
+        Per-season accuracy and log loss are kept in
+        `backtest_results`, and their means over the seasons in `log`.
+
+    init_online_models(classifiers, n_epochs): Fits estimators that
+        support incremental updates ("SGD", "GNB", "MLP") with
+        `partial_fit` on the selected rows, after a `StandardScaler`
+        also fitted with `partial_fit`, and checkpoints them.
+
+    update_online_models(): Reads only the processed daily team box
+        score files after the last game seen by the online models,
+        scores the new games before learning from them (logged in
+        `online_log`), updates scaler and models in place with
+        `partial_fit` and checkpoints them.  The cost scales with the
+        new days of games, not with the whole data set.
+
+    save_online_models(checkpoint_path), load_online_models(
+        checkpoint_path): Saves/loads online models with their scaler,
+        features and last game date (`data_preprocessed/online_models.pkl`
+        by default).
+
+    save_model(clf_str, model_path): Fits a classifier on all
+        selected rows and saves it with its feature list for
+        `PredictionService`.
         
-    plot_results(): Plots classifier accuracy and log loss.
+    plot_results(): Plots classifier accuracy and log loss.  Seaborn
+        and matplotlib are imported only by this method.
+
+    `load_data` and `train_and_test_models` are timed by
+    `instrumentation` (`StageInstrumentation`), shared with
+    `DataProcessor` when passed to both.
 
     Requirements:
-        sklearn, pandas, numpy, seaborn, matplotlib
+        sklearn, pandas, numpy, pyarrow (Parquet store), seaborn and
+        matplotlib (`plot_results`)
 """
 
-from sklearn.metrics import accuracy_score, log_loss
-from sklearn.model_selection import StratifiedShuffleSplit
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.svm import SVC, LinearSVC, NuSVC
-from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
-from sklearn.ensemble import RandomForestClassifier, AdaBoostClassifier, \
-                             GradientBoostingClassifier
-from sklearn.naive_bayes import GaussianNB
-from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
-from sklearn.discriminant_analysis import QuadraticDiscriminantAnalysis
-from sklearn.linear_model import LogisticRegression
 import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 import os
+import time
+import pickle
+import hashlib
+import shutil
+import tempfile
 import datetime
+import math
+import warnings
+import importlib
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from .ModelRegistry import ModelRegistry
+from .StageInstrumentation import StageInstrumentation
+from .RollingFeatureEngine import RollingFeatureEngine
+from .MatchupFeatures import MatchupFeatures
+from .TeamBoxSchema import TeamBoxSchema
 
 
 # Hides sklearn warnings for nice printing
-def warn(*args, **kwargs): pass
-import warnings
-warnings.warn = warn
-from sklearn.exceptions import DataConversionWarning
-warnings.filterwarnings(action='ignore', category=DataConversionWarning)
+warnings.filterwarnings(action='ignore', module='sklearn')
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
 
+def _fit_and_score(X, y, clf, train_index, test_index, catch_errors = False):
+    # Fits one classifier on one split and scores it on the test set,
+    # returning fit and predict times with the scores
+    time_start = time.perf_counter()
+    try:
+        clf = clf.fit(X[train_index, :], y[train_index])
+    except (ValueError, np.linalg.LinAlgError):
+        # Searched parameters that fail to fit are scored as NaN
+        if not catch_errors:
+            raise
+        return np.nan, np.nan, None, time.perf_counter() - time_start, 0.0
+    fit_time = time.perf_counter() - time_start
+    accuracy, ll, predict_time = _score(X, y, clf, test_index)
+    return accuracy, ll, clf, fit_time, predict_time
+
+
+def _score(X, y, clf, test_index):
+    from sklearn.metrics import accuracy_score, log_loss
+    time_start = time.perf_counter()
+    train_predictions = clf.predict(X[test_index, :])
+    accuracy = accuracy_score(y[test_index], train_predictions)
+    
+    train_predictions = clf.predict_proba(X[test_index, :])
+    predict_time = time.perf_counter() - time_start
+    ll = log_loss(y[test_index], train_predictions, labels=[0, 1])
+    return accuracy, ll, predict_time
+
+
+def _walk_forward_and_score(X, y, clf, train_indices, test_indices, \
+                            reuse_state = None):
+    # Fits and scores one classifier on consecutive walk-forward
+    # windows.  With `reuse_state` the fitted state is carried to the
+    # next window, updated with `partial_fit` on the new training rows
+    # only (expanding windows) or refitted from it with `warm_start`
+    results = []
+    train_index_last = None
+    for train_index, test_index in zip(train_indices, test_indices):
+        if reuse_state == "partial_fit" and train_index_last is not None:
+            time_start = time.perf_counter()
+            new_index = train_index[train_index_last.shape[0]:]
+            clf.partial_fit(X[new_index, :], y[new_index])
+            fit_time = time.perf_counter() - time_start
+            accuracy, ll, predict_time = _score(X, y, clf, test_index)
+        else:
+            if reuse_state == "warm_start" and train_index_last is not None:
+                clf.set_params(warm_start=True)
+            accuracy, ll, clf, fit_time, predict_time = \
+                _fit_and_score(X, y, clf, train_index, test_index)
+        results.append((accuracy, ll, fit_time, predict_time))
+        train_index_last = train_index
+    return results
+
+
+_shared_arrays = {}
+
+
+def _run_shared(fit_func, X_path, y_path, *args):
+    # Opens the memory-mapped matrix once per worker process
+    for path in [X_path, y_path]:
+        if path not in _shared_arrays:
+            _shared_arrays[path] = np.load(path, mmap_mode="r")
+    return fit_func(_shared_arrays[X_path], _shared_arrays[y_path], *args)
+
+
+# Classifier keys with the module, class and parameters of their
+# estimator, imported only when the classifier is used
+_classifier_registry = {"KNN": ("sklearn.neighbors", "KNeighborsClassifier", \
+                                {"n_neighbors": 3}), \
+                        "SVC": ("sklearn.svm", "SVC", \
+                                {"kernel": "rbf", "C": 0.025, \
+                                 "probability": True}), \
+                        "NSVC": ("sklearn.svm", "NuSVC", {"probability": True}), \
+                        "DTC": ("sklearn.tree", "DecisionTreeClassifier", {}), \
+                        "DTR": ("sklearn.tree", "DecisionTreeRegressor", {}), \
+                        "RFC": ("sklearn.ensemble", "RandomForestClassifier", {}), \
+                        "ABC": ("sklearn.ensemble", "AdaBoostClassifier", {}), \
+                        "GBC": ("sklearn.ensemble", \
+                                "GradientBoostingClassifier", {}), \
+                        "GNB": ("sklearn.naive_bayes", "GaussianNB", {}), \
+                        "LDA": ("sklearn.discriminant_analysis", \
+                                "LinearDiscriminantAnalysis", {}), \
+                        "QDA": ("sklearn.discriminant_analysis", \
+                                "QuadraticDiscriminantAnalysis", {}), \
+                        "LR": ("sklearn.linear_model", "LogisticRegression", {}), \
+                        "SGD": ("sklearn.linear_model", "SGDClassifier", \
+                                {"loss": "log_loss"}), \
+                        "MLP": ("sklearn.neural_network", "MLPClassifier", \
+                                {"hidden_layer_sizes": (32,)})}
+
+# Parameter spaces searched by `search_hyperparameters`
+_param_spaces = {"KNN": {"n_neighbors": [3, 5, 11, 25, 51, 101], \
+                         "weights": ["uniform", "distance"]}, \
+                 "SVC": {"C": [0.025, 0.1, 1.0, 10.0], \
+                         "gamma": ["scale", 0.01, 0.1]}, \
+                 "NSVC": {"nu": [0.25, 0.5, 0.75]}, \
+                 "DTC": {"max_depth": [3, 5, 8, 12, None], \
+                         "min_samples_leaf": [1, 10, 50]}, \
+                 "RFC": {"max_depth": [5, 10, None], \
+                         "min_samples_leaf": [1, 5, 20], \
+                         "max_features": ["sqrt", 0.5]}, \
+                 "ABC": {"learning_rate": [0.1, 0.3, 1.0]}, \
+                 "GBC": {"learning_rate": [0.03, 0.1, 0.3], \
+                         "max_depth": [2, 3, 5]}, \
+                 "GNB": {"var_smoothing": [1e-9, 1e-7, 1e-5, 1e-3]}, \
+                 "LDA": {"solver": ["lsqr"], \
+                         "shrinkage": [None, "auto", 0.1, 0.5]}, \
+                 "QDA": {"reg_param": [0.0, 0.01, 0.1, 0.5]}, \
+                 "LR": {"C": [0.01, 0.1, 1.0, 10.0]}, \
+                 "SGD": {"alpha": [1e-5, 1e-4, 1e-3, 1e-2]}, \
+                 "MLP": {"hidden_layer_sizes": [(16,), (32,), (64, 16)], \
+                         "alpha": [1e-4, 1e-2]}}
+
+# Ensembles are budgeted by number of estimators instead of rows,
+# up to the scikit-learn defaults
+_budget_params = {"RFC": ("n_estimators", 100), \
+                  "ABC": ("n_estimators", 50), \
+                  "GBC": ("n_estimators", 100)}
+
+# Classifiers whose solver starts from the previous fit with `warm_start`
+_warm_start_classifiers = ["LR"]
+
+
 class DataClassifier:        
-    def __init__(self, proc_dir = "data_preprocessed"):
+    def __init__(self, proc_dir = "data_preprocessed", instrumentation = None):
+        if instrumentation is None:
+            instrumentation = StageInstrumentation()
+        self.instrumentation = instrumentation
         self.proc_team_file_path = proc_dir + "/team_box_scores/"
+        self.split_cache_path = proc_dir + "/split_cache/"
+        self.player_feature_file_path = proc_dir + "/player_features/"
+        self.online_checkpoint_path = proc_dir + "/online_models.pkl"
+        self.model_registry = ModelRegistry(proc_dir + "/model_registry/")
         datetime_now = datetime.datetime.now()
         self.date_today = datetime.date(datetime_now.year,\
                                        datetime_now.month,\
                                        datetime_now.day)
         self.team_full_df = pd.DataFrame()
+        self.date_index = None
+        self.best_params = {}
         self.set_feats_and_labels()
         self.set_train_test_split()
         self.set_classifiers()
                 
             
-    def load_data(self):
-        print("\nLoading model from processed data.\n")
-        processed_complete_file_path = "./" + self.proc_team_file_path \
+    def load_data(self, columns = None, start_year = None, end_year = None, \
+                  start_date = None, end_date = None):
+        self.instrumentation.log("\nLoading model from processed data.\n", 1)
+        with self.instrumentation.stage("load_data"):
+            self.__load_data(columns, start_year, end_year, start_date, end_date)
+            self.__set_date_index()
+            self.instrumentation.count_rows(self.team_full_df.shape[0])
+
+
+    def __load_data(self, columns, start_year, end_year, start_date, end_date):
+        columnar_dir_path = self.proc_team_file_path \
+                            + "complete_processed_team_box/"
+        processed_complete_file_path = self.proc_team_file_path \
                                        + "complete_processed_team_box.csv"
-        self.team_full_df = pd.read_csv(processed_complete_file_path)
+
+        if start_date is not None:
+            start_date = pd.Timestamp(start_date).date()
+        if end_date is not None:
+            end_date = pd.Timestamp(end_date).date()
+
+        if os.path.isdir(columnar_dir_path):
+            import pyarrow.dataset as ds
+            dataset = ds.dataset(columnar_dir_path, format="parquet", \
+                                 partitioning="hive")
+
+            # Season bounds prune partitions, date bounds prune row groups
+            row_filter = None
+            bounds = [(start_year, ds.field("season") >= start_year), \
+                      (end_year, ds.field("season") <= end_year), \
+                      (start_date, ds.field("game_date") >= start_date), \
+                      (end_date, ds.field("game_date") <= end_date)]
+            for bound, expression in bounds:
+                if bound is not None:
+                    if row_filter is None:
+                        row_filter = expression
+                    else:
+                        row_filter = row_filter & expression
+
+            columns = self.__get_load_columns(columns, dataset.schema.names)
+            table = dataset.to_table(columns=columns, filter=row_filter)
+            self.team_full_df = table.to_pandas(date_as_object=False)
+            for fragment in dataset.get_fragments(filter=row_filter):
+                self.instrumentation.count_read(fragment.path)
+        else:
+            usecols = None
+            if columns is not None:
+                usecols = self.__get_load_columns(columns, \
+                    pd.read_csv(processed_complete_file_path, nrows=0).columns)
+            team_full_df = pd.read_csv(processed_complete_file_path, \
+                                       usecols=usecols, \
+                                       parse_dates=["game_date"])
+            self.instrumentation.count_read(processed_complete_file_path)
+
+            game_date = team_full_df["game_date"]
+            season = game_date.dt.year.where(game_date.dt.month >= 7, \
+                                             game_date.dt.year - 1)
+            idx = pd.Series(True, index=team_full_df.index)
+            if start_year is not None:
+                idx &= season >= start_year
+            if end_year is not None:
+                idx &= season <= end_year
+            if start_date is not None:
+                idx &= game_date >= pd.Timestamp(start_date)
+            if end_date is not None:
+                idx &= game_date <= pd.Timestamp(end_date)
+
+            self.team_full_df = team_full_df.loc[idx].reset_index(drop=True)
+        self.team_full_df = TeamBoxSchema.apply(self.team_full_df)
+
+
+    def __get_load_columns(self, columns, available_cols):
+        # Dates and playoff flags are needed to select rows
+        if columns is None:
+            return list(available_cols)
+        columns = list(columns)
+        for col in ["game_date", "playoffs"]:
+            if col not in columns and col in available_cols:
+                columns.append(col)
+        return columns
+
+
+    def __set_date_index(self):
+        if "game_date" not in self.team_full_df.columns:
+            self.date_index = None
+            return
+        if not self.team_full_df["game_date"].is_monotonic_increasing:
+            self.team_full_df = self.team_full_df.sort_values(\
+                "game_date", kind="mergesort").reset_index(drop=True)
+        self.date_index = pd.DatetimeIndex(self.team_full_df["game_date"])
+
+
+    def __get_selected_rows(self):
+        # Seasons run from July to June, so they are a slice of the
+        # sorted date index
+        if self.date_index is None:
+            return self.team_full_df
+        date_start = None
+        if self.start_year is not None:
+            date_start = pd.Timestamp(self.start_year, 7, 1)
+        date_end = pd.Timestamp(self.end_year + 1, 7, 1) - pd.Timedelta(1, "ns")
+        team_df = self.team_full_df.iloc[self.date_index.slice_indexer(\
+            date_start, date_end)]
+        if self.skip_playoffs:
+            if "playoffs" in team_df.columns:
+                team_df = team_df.loc[~team_df["playoffs"].fillna(False) \
+                                               .to_numpy(dtype=bool)]
+            else:
+                self.instrumentation.log("Playoff flags not found, " \
+                                         + "keeping playoff games.", 1)
+        return self.__drop_unlabeled(team_df)
+
+
+    def __drop_unlabeled(self, team_df):
+        # Rows without a label (e.g., games not matched to the schedule)
+        # are left out rather than counted as losses
+        labels = team_df.loc[:, self.labels[0]]
+        if labels.isna().any():
+            team_df = team_df.loc[labels.notna().to_numpy()]
+        return team_df
+
+
+    def add_pre_game_features(self, feature_engine = None, dropna = True):
+        if feature_engine is None:
+            feature_engine = RollingFeatureEngine()
+        self.feature_engine = feature_engine
+        with self.instrumentation.stage("add_pre_game_features"):
+            features_df = feature_engine.compute(self.team_full_df)
+            self.team_full_df = pd.concat([self.team_full_df.drop(\
+                columns=feature_engine.feats, errors="ignore"), features_df], axis=1)
+            if dropna:
+                self.team_full_df = self.team_full_df.dropna(\
+                    subset=feature_engine.feats).reset_index(drop=True)
+            self.__set_date_index()
+            self.instrumentation.count_rows(self.team_full_df.shape[0])
+        return feature_engine.feats
+
+
+    def add_matchup_features(self, matchup_features = None, dropna = True):
+        if matchup_features is None:
+            matchup_features = MatchupFeatures()
+        with self.instrumentation.stage("add_matchup_features"):
+            features_df = matchup_features.compute(self.team_full_df)
+            self.team_full_df = pd.concat([self.team_full_df.drop(\
+                columns=matchup_features.feats, errors="ignore"), features_df], \
+                axis=1)
+            if dropna:
+                self.team_full_df = self.team_full_df.dropna(\
+                    subset=matchup_features.feats).reset_index(drop=True)
+            self.__set_date_index()
+            self.instrumentation.count_rows(self.team_full_df.shape[0])
+        return matchup_features.feats
+
+
+    def add_player_features(self, dropna = True):
+        with self.instrumentation.stage("add_player_features"):
+            player_feature_dfs = []
+            for file_name in sorted(os.listdir(self.player_feature_file_path)):
+                if not file_name.endswith("_player_features.csv"):
+                    continue
+                file_path = self.player_feature_file_path + file_name
+                player_feature_dfs.append(pd.read_csv(file_path, \
+                                                      parse_dates=["game_date"]))
+                self.instrumentation.count_read(file_path)
+            player_feature_df = pd.concat(player_feature_dfs, ignore_index=True)
+            feats = [col for col in player_feature_df.columns \
+                     if col not in ["team", "game_date"]]
+
+            team_full_df = self.team_full_df.drop(columns=feats, errors="ignore")
+            team_full_df["game_date"] = pd.to_datetime(team_full_df["game_date"])
+            player_feature_df["team"] = player_feature_df["team"] \
+                                        .astype(team_full_df["team"].dtype)
+            self.team_full_df = team_full_df.merge(player_feature_df, \
+                                                   on=["team", "game_date"], \
+                                                   how="left")
+            if dropna:
+                self.team_full_df = self.team_full_df.dropna(\
+                    subset=feats).reset_index(drop=True)
+            self.__set_date_index()
+            self.instrumentation.count_rows(self.team_full_df.shape[0])
+        return feats
     
         
     def set_feats_and_labels(self, feats = ["attempted_field_goals", \
@@ -84,24 +501,27 @@ class DataClassifier:
                             labels = ["outcome"], \
                             skip_playoffs = True, \
                             start_year = 2007, \
-                            end_year = []):
+                            end_year = None):
         self.feats = feats
         self.labels = labels
         self.skip_playoffs = skip_playoffs
         self.start_year = start_year
-        if not end_year or end_year > self.date_today.year:
-            if self.date_today.month < 10:
-                self.end_year = end_year - 1
-            else:
-                self.end_year = end_year
+        if self.date_today.month < 10:
+            current_season_start_year = self.date_today.year-1
+        else:
+            current_season_start_year = self.date_today.year
+        if not end_year or end_year > current_season_start_year:
+            self.end_year = current_season_start_year
         else:
             self.end_year = end_year
         
     
-    def set_train_test_split(self, n_splits=10, test_size = 0.2, rng_seed=0):
+    def set_train_test_split(self, n_splits=10, test_size = 0.2, rng_seed=0, \
+                             cache_splits = True):
         self.n_splits = n_splits
         self.test_size = test_size
         self.rng_seed_init = rng_seed
+        self.cache_splits = cache_splits
         
         
     def set_classifiers(self, classifiers = ["KNN", 
@@ -118,39 +538,81 @@ class DataClassifier:
         self.classifiers = classifiers
     
         
-    def train_and_test_models(self, verbose=True):
+    def train_and_test_models(self, verbose=True, n_jobs=1, use_registry=True):
+        with self.instrumentation.stage("train_and_test_models"):
+            self.__train_and_test_models(verbose, n_jobs, use_registry)
+
+
+    def __train_and_test_models(self, verbose, n_jobs, use_registry):
+        from sklearn.base import clone
         
-        self.X = self.team_full_df.loc[:, self.feats]
-        self.y = self.team_full_df.loc[:, self.labels]
+        # Builds feature matrix and labels once for all jobs
+        self.__set_feature_matrix()
+        self.instrumentation.count_rows(self.X.shape[0])
+        data_hash = hashlib.sha1(self.X.tobytes() + self.y.tobytes()).hexdigest()
         
-        self.accuracy_arr = np.zeros((self.n_splits,))
-        self.ll_arr = np.zeros((self.n_splits,))
+        # Builds one job per classifier and split, seeded by split,
+        # skipping classifiers found in the model registry
+        rng_seeds = [self.rng_seed_init + idx_model \
+                     for idx_model in range(0, self.n_splits)]
+        split_indices = self.__get_split_indices(rng_seeds)
+        jobs = []
+        names = []
+        entries = {}
+        registry_keys = {}
+        for idx_clf, clf_str in enumerate(self.classifiers):
+            clf, name = self.__get_classifier(clf_str)
+            names.append(name)
+            if use_registry:
+                registry_keys[idx_clf] = ModelRegistry.get_key(\
+                    [self.feats, self.labels, data_hash, \
+                     clf.__class__.__name__, sorted(clf.get_params().items()), \
+                     rng_seeds, self.test_size])
+                entry = self.model_registry.load(registry_keys[idx_clf])
+                if entry is not None:
+                    entries[idx_clf] = entry
+                    continue
+            for rng_seed in rng_seeds:
+                train_index, test_index = split_indices[rng_seed]
+                clf_job = clone(clf)
+                if "random_state" in clf_job.get_params():
+                    clf_job.set_params(random_state=rng_seed)
+                jobs.append((idx_clf, (clf_job, train_index, test_index)))
+
+        results = self.__run_fit_jobs([job for idx_clf, job in jobs], n_jobs)
+        fitted_clfs = sorted(set([idx_clf for idx_clf, job in jobs]))
+        for idx_clf in fitted_clfs:
+            clf_results = [result for (idx_job, job), result in zip(jobs, results) \
+                           if idx_job == idx_clf]
+            entries[idx_clf] = {"name": names[idx_clf], \
+                                "models": [result[2] for result in clf_results], \
+                                "accuracy": np.array([result[0] for result \
+                                                      in clf_results]), \
+                                "log_loss": np.array([result[1] for result \
+                                                      in clf_results]), \
+                                "fit_time": np.array([result[3] for result \
+                                                      in clf_results]), \
+                                "predict_time": np.array([result[4] for result \
+                                                          in clf_results])}
+            if use_registry:
+                self.model_registry.save(registry_keys[idx_clf], entries[idx_clf])
         
         self.log_cols=["Classifier", "Accuracy", "Log Loss"]
-        self.log = pd.DataFrame(columns=self.log_cols)
+        log_entries = []
+        self.models = {}
         
-        for clf_str in self.classifiers:
-            for idx_model in range(0, self.n_splits):
-                X_train, X_test, y_train, y_test \
-                    = self.__get_train_test_split(self.rng_seed_init + idx_model)
-                
-                clf, name = self.__get_classifier(clf_str)
-                #print("Training and testing classifier " \
-                #      + name + " for model :",\
-                #      idx_model+1, "of", self.n_splits)
-                clf = clf.fit(X_train, y_train)
-                
-                train_predictions = clf.predict(X_test)
-                self.accuracy_arr[idx_model] = accuracy_score(y_test, train_predictions)
-                
-                train_predictions = clf.predict_proba(X_test)
-                self.ll_arr[idx_model] = log_loss(y_test, train_predictions)
+        for idx_clf, name in enumerate(names):
+            self.__emit_classifier_event(name, entries[idx_clf], \
+                                         idx_clf in fitted_clfs)
+            self.models[self.classifiers[idx_clf]] = entries[idx_clf]["models"]
+            self.accuracy_arr = entries[idx_clf]["accuracy"]
+            self.ll_arr = entries[idx_clf]["log_loss"]
+
+            acc_temp = np.mean(self.accuracy_arr)
+            var_temp = np.var(self.accuracy_arr)
+            ll_temp = np.mean(self.ll_arr)
                     
             if verbose:
-                acc_temp = np.mean(self.accuracy_arr)
-                var_temp = np.var(self.accuracy_arr)
-                ll_temp = np.mean(self.ll_arr)
-                
                 print("="*30)
                 print(name)
                 print('****Results****')
@@ -159,14 +621,458 @@ class DataClassifier:
                     print("Variance : {:.6}".format(var_temp))
                 print("Log Loss : {:.8}".format(ll_temp))
 
-            log_entry = pd.DataFrame([[name, acc_temp*100, ll_temp]], columns=self.log_cols)
-            self.log = self.log.append(log_entry)
+            log_entries.append([name, acc_temp*100, ll_temp])
+
+        self.log = pd.DataFrame(log_entries, columns=self.log_cols)
+
+        if verbose:
+            print("="*30)
+
+
+    def __emit_classifier_event(self, name, entry, is_fitted):
+        # Fit/predict time summed over splits; registry hits were not fitted
+        fit_time = float(np.sum(entry.get("fit_time", 0)))
+        predict_time = float(np.sum(entry.get("predict_time", 0)))
+        self.instrumentation.emit("classifier", stage="train_and_test_models", \
+                                  classifier=name, \
+                                  n_fits=len(entry["models"]) if is_fitted else 0, \
+                                  fit_s=fit_time, predict_s=predict_time, \
+                                  from_registry=not is_fitted)
+        if is_fitted:
+            self.instrumentation.log("  " + name + ": " + str(len(entry["models"])) \
+                                     + " fits, {:.3f} s fit, ".format(fit_time) \
+                                     + "{:.3f} s predict".format(predict_time))
+        else:
+            self.instrumentation.log("  " + name + ": loaded from model registry")
+
+
+    def search_hyperparameters(self, classifiers = None, param_spaces = None, \
+                               factor = 3, min_rows = 1000, \
+                               scoring = "log_loss", n_jobs = -1, verbose = True):
+        if classifiers is None:
+            classifiers = self.classifiers
+        if param_spaces is None:
+            param_spaces = _param_spaces
+        self.instrumentation.log("\nSearching hyperparameters.\n", 1)
+        with self.instrumentation.stage("search_hyperparameters"):
+            self.__search_hyperparameters(classifiers, param_spaces, factor, \
+                                          min_rows, scoring, n_jobs, verbose)
+
+
+    def __search_hyperparameters(self, classifiers, param_spaces, factor, \
+                                 min_rows, scoring, n_jobs, verbose):
+        from sklearn.base import clone
+        from sklearn.model_selection import ParameterGrid
+        self.__set_feature_matrix()
+        self.instrumentation.count_rows(self.X.shape[0])
+        rng_seeds = [self.rng_seed_init + idx_model \
+                     for idx_model in range(0, self.n_splits)]
+        split_indices = self.__get_split_indices(rng_seeds)
+        n_train_rows = min([train_index.shape[0] for train_index, test_index \
+                            in split_indices.values()])
+
+        # Plans the budget of every round of each classifier, ending
+        # with the full budget in the last round of all classifiers
+        searches = []
+        for clf_str in classifiers:
+            clf, name = self.__get_classifier(clf_str, tuned=False)
+            candidates = list(ParameterGrid(param_spaces.get(clf_str, {})))
+            # Enough rounds for a single candidate at the full budget
+            n_rounds = 1
+            if len(candidates) > 1:
+                n_rounds = int(math.ceil(math.log(len(candidates)) \
+                                         /math.log(factor) - 1e-9)) + 1
+            if clf_str in _budget_params:
+                budget_param, max_budget = _budget_params[clf_str]
+                min_budget = max(max_budget//factor**(n_rounds - 1), 1)
+            else:
+                budget_param, max_budget = None, n_train_rows
+                min_budget = min(max(max_budget//factor**(n_rounds - 1), \
+                                     min_rows), max_budget)
+            budgets = [min(min_budget*factor**idx_round, max_budget) \
+                       for idx_round in range(n_rounds - 1)] + [max_budget]
+            searches.append({"clf_str": clf_str, "name": name, \
+                             "candidates": candidates, \
+                             "budget_param": budget_param, "budgets": budgets})
+        n_rounds = max([len(search["budgets"]) for search in searches])
+        for search in searches:
+            search["first_round"] = n_rounds - len(search["budgets"])
+
+        # Runs each round of all classifiers on the process pool at once
+        search_results = []
+        for idx_round in range(n_rounds):
+            jobs = []
+            round_searches = [search for search in searches \
+                              if idx_round >= search["first_round"]]
+            for search in round_searches:
+                budget = search["budgets"][idx_round - search["first_round"]]
+                search["budget"] = budget
+                for idx_candidate, params in enumerate(search["candidates"]):
+                    clf, name = self.__get_classifier(search["clf_str"], tuned=False)
+                    clf.set_params(**params)
+                    if search["budget_param"] is not None:
+                        clf.set_params(**{search["budget_param"]: budget})
+                    for rng_seed in rng_seeds:
+                        # Training folds are shuffled, so their first
+                        # rows are a random subsample
+                        train_index, test_index = split_indices[rng_seed]
+                        if search["budget_param"] is None:
+                            train_index = train_index[:budget]
+                        clf_job = clone(clf)
+                        if "random_state" in clf_job.get_params():
+                            clf_job.set_params(random_state=rng_seed)
+                        jobs.append(((search["clf_str"], idx_candidate), \
+                                     (clf_job, train_index, test_index, True)))
+            results = self.__run_fit_jobs([job for key, job in jobs], n_jobs)
+            job_results = {}
+            for (key, job), result in zip(jobs, results):
+                job_results.setdefault(key, []).append(result)
+
+            # Keeps the best 1/factor candidates of each classifier
+            for search in round_searches:
+                scores = []
+                for idx_candidate, params in enumerate(search["candidates"]):
+                    clf_results = job_results[(search["clf_str"], idx_candidate)]
+                    accuracy = np.mean([result[0] for result in clf_results])
+                    ll = np.mean([result[1] for result in clf_results])
+                    search_results.append({"classifier": search["name"], \
+                                           "params": params, \
+                                           "round": idx_round, \
+                                           "budget": search["budget"], \
+                                           "accuracy": accuracy, \
+                                           "log_loss": ll})
+                    score = ll if scoring == "log_loss" else -accuracy
+                    if np.isnan(score):
+                        score = np.inf
+                    scores.append((score, idx_candidate, clf_results))
+                self.instrumentation.log("  " + search["name"] + " round " \
+                                         + str(idx_round + 1) + ": " \
+                                         + str(len(scores)) + " candidates, " \
+                                         + (search["budget_param"] or "rows") \
+                                         + " " + str(search["budget"]))
+                scores.sort(key=lambda score: score[:2])
+                n_keep = max(1, int(math.ceil(len(scores)/factor)))
+                search["candidates"] = [search["candidates"][idx_candidate] \
+                                        for score, idx_candidate, clf_results \
+                                        in scores[:n_keep]]
+                search["best_results"] = scores[0][2]
+
+        # Logs the best configuration of each classifier
+        self.search_results = pd.DataFrame(search_results)
+        self.log_cols=["Classifier", "Accuracy", "Log Loss"]
+        log_entries = []
+        self.models = {}
+        for search in searches:
+            clf_str = search["clf_str"]
+            best_params = dict(search["candidates"][0])
+            if search["budget_param"] is not None:
+                best_params[search["budget_param"]] = search["budgets"][-1]
+            self.best_params[clf_str] = best_params
+            clf_results = search["best_results"]
+            self.models[clf_str] = [result[2] for result in clf_results]
+            acc_temp = np.mean([result[0] for result in clf_results])
+            ll_temp = np.mean([result[1] for result in clf_results])
+            if verbose:
+                print("="*30)
+                print(search["name"])
+                print('****Results****')
+                print("Parameters : " + str(best_params))
+                print("Accuracy : {:.4%}".format(acc_temp))
+                print("Log Loss : {:.8}".format(ll_temp))
+            log_entries.append([search["name"], acc_temp*100, ll_temp])
+        self.log = pd.DataFrame(log_entries, columns=self.log_cols)
+
+        if verbose:
+            print("="*30)
+
+
+    def backtest_models(self, classifiers = None, window = "expanding", \
+                        n_train_seasons = 1, first_test_season = None, \
+                        reuse_state = True, n_jobs = -1, verbose = True):
+        if classifiers is None:
+            classifiers = self.classifiers
+        if window not in ["expanding", "sliding"]:
+            raise ValueError("Unknown backtest window: " + str(window))
+        self.instrumentation.log("\nBacktesting models.\n", 1)
+        with self.instrumentation.stage("backtest_models"):
+            self.__backtest_models(classifiers, window, n_train_seasons, \
+                                   first_test_season, reuse_state, n_jobs, \
+                                   verbose)
+
+
+    def __backtest_models(self, classifiers, window, n_train_seasons, \
+                          first_test_season, reuse_state, n_jobs, verbose):
+        from sklearn.base import clone
+        self.__set_feature_matrix()
+        self.instrumentation.count_rows(self.X.shape[0])
+
+        # Rows are in date order, so every season is a block of rows
+        game_dates = pd.DatetimeIndex(self.__get_selected_rows()["game_date"])
+        row_seasons = np.where(game_dates.month >= 7, game_dates.year, \
+                               game_dates.year - 1)
+        seasons = list(pd.unique(row_seasons))
+        season_starts = np.searchsorted(row_seasons, seasons, side="left")
+        season_ends = np.searchsorted(row_seasons, seasons, side="right")
+
+        # Trains on the seasons before each test season: all of them
+        # (expanding) or the last `n_train_seasons` (sliding)
+        test_seasons = seasons[n_train_seasons:]
+        if first_test_season is not None:
+            test_seasons = [season for season in seasons[1:] \
+                            if season >= first_test_season]
+        train_indices = []
+        test_indices = []
+        for season in test_seasons:
+            idx_season = seasons.index(season)
+            idx_first = 0
+            if window == "sliding":
+                idx_first = max(idx_season - n_train_seasons, 0)
+            train_indices.append(np.arange(season_starts[idx_first], \
+                                           season_starts[idx_season]))
+            test_indices.append(np.arange(season_starts[idx_season], \
+                                          season_ends[idx_season]))
+        if not test_seasons:
+            raise ValueError("No season to test after the training seasons.")
+
+        # Classifiers that can reuse their fitted state walk through
+        # the windows in one job, the others fit each window in its own
+        jobs = []
+        names = {}
+        for clf_str in classifiers:
+            clf, names[clf_str] = self.__get_classifier(clf_str)
+            if "random_state" in clf.get_params():
+                clf.set_params(random_state=self.rng_seed_init)
+            clf_reuse_state = None
+            if reuse_state and hasattr(clf, "partial_fit") \
+               and window == "expanding":
+                clf_reuse_state = "partial_fit"
+            elif reuse_state and clf_str in _warm_start_classifiers:
+                clf_reuse_state = "warm_start"
+            if clf_reuse_state is not None:
+                jobs.insert(0, ((clf_str, 0), (clone(clf), train_indices, \
+                                               test_indices, clf_reuse_state)))
+                continue
+            for idx_window in range(len(test_seasons)):
+                jobs.append(((clf_str, idx_window), \
+                             (clone(clf), train_indices[idx_window:idx_window + 1], \
+                              test_indices[idx_window:idx_window + 1], None)))
+        results = self.__run_fit_jobs([job for key, job in jobs], n_jobs, \
+                                      fit_func=_walk_forward_and_score)
+        window_results = {}
+        for ((clf_str, idx_window), job), job_results in zip(jobs, results):
+            for idx_result, result in enumerate(job_results):
+                window_results[(clf_str, idx_window + idx_result)] = result
+
+        # Logs per-season results and their mean over the seasons
+        backtest_entries = []
+        log_entries = []
+        for clf_str in classifiers:
+            name = names[clf_str]
+            clf_results = [window_results[(clf_str, idx_window)] \
+                           for idx_window in range(len(test_seasons))]
+            for season, train_index, test_index, result in zip(\
+                    test_seasons, train_indices, test_indices, clf_results):
+                backtest_entries.append([name, season, result[0]*100, \
+                                         result[1], train_index.shape[0], \
+                                         test_index.shape[0], result[2], \
+                                         result[3]])
+            acc_temp = np.mean([result[0] for result in clf_results])
+            ll_temp = np.mean([result[1] for result in clf_results])
+            fit_time = float(np.sum([result[2] for result in clf_results]))
+            self.instrumentation.log("  " + name + ": " + str(len(clf_results)) \
+                                     + " seasons, {:.3f} s fit".format(fit_time))
+            if verbose:
+                print("="*30)
+                print(name)
+                print('****Results****')
+                print("Seasons : " + str(test_seasons[0]) + "-" \
+                      + str(test_seasons[-1]))
+                print("Accuracy : {:.4%}".format(acc_temp))
+                print("Log Loss : {:.8}".format(ll_temp))
+            log_entries.append([name, acc_temp*100, ll_temp])
+        self.backtest_results = pd.DataFrame(backtest_entries, \
+                                             columns=["Classifier", "Season", \
+                                                      "Accuracy", "Log Loss", \
+                                                      "n_train", "n_test", \
+                                                      "fit_s", "predict_s"])
+        self.log_cols=["Classifier", "Accuracy", "Log Loss"]
+        self.log = pd.DataFrame(log_entries, columns=self.log_cols)
 
         if verbose:
             print("="*30)
+
+
+    def init_online_models(self, classifiers = ["SGD", "GNB", "MLP"], \
+                           n_epochs = 5):
+        from sklearn.preprocessing import StandardScaler
+        self.instrumentation.log("\nFitting online models.\n", 1)
+        with self.instrumentation.stage("init_online_models"):
+            self.__set_feature_matrix()
+            self.instrumentation.count_rows(self.X.shape[0])
+            self.online_scaler = StandardScaler()
+            self.online_models = {}
+            for clf_str in classifiers:
+                clf, name = self.__get_classifier(clf_str)
+                self.online_models[clf_str] = clf
+            self.online_date_last = self.__get_selected_rows()["game_date"].max()
+            self.online_log = pd.DataFrame(columns=["game_date", "Classifier", \
+                                                    "n_games", "Accuracy", \
+                                                    "Log Loss"])
+
+            # Shuffles rows on every pass, as partial_fit is one epoch
+            self.online_scaler.partial_fit(self.X)
+            rng = np.random.RandomState(self.rng_seed_init)
+            for idx_epoch in range(n_epochs):
+                order = rng.permutation(self.X.shape[0])
+                self.__partial_fit_online_models(self.X[order, :], \
+                                                 self.y[order])
+            self.save_online_models()
+
+
+    def update_online_models(self):
+        self.instrumentation.log("\nUpdating online models.\n", 1)
+        with self.instrumentation.stage("update_online_models"):
+            self.__update_online_models()
+
+
+    def __update_online_models(self):
+        from sklearn.metrics import accuracy_score, log_loss
+        team_df = self.__drop_unlabeled(\
+            self.__read_daily_team_box(self.online_date_last))
+        if self.skip_playoffs and "playoffs" in team_df.columns:
+            team_df = team_df.loc[~team_df["playoffs"].fillna(False) \
+                                           .to_numpy(dtype=bool)]
+        if team_df.shape[0] == 0:
+            self.instrumentation.log("No new games since " \
+                                     + str(self.online_date_last.date()))
+            return
+        self.instrumentation.count_rows(team_df.shape[0])
+        X, y = self.__get_feature_arrays(team_df)
+
+        # Scores new games before learning from them
+        X_scaled = self.online_scaler.transform(X)
+        log_entries = []
+        for clf_str, clf in self.online_models.items():
+            probabilities = clf.predict_proba(X_scaled)
+            log_entries.append([team_df["game_date"].max(), \
+                                clf.__class__.__name__, X.shape[0], \
+                                accuracy_score(y, probabilities.argmax(axis=1))*100, \
+                                log_loss(y, probabilities, labels=[0, 1])])
+        log_df = pd.DataFrame(log_entries, columns=self.online_log.columns)
+        if self.online_log.shape[0] == 0:
+            self.online_log = log_df
+        else:
+            self.online_log = pd.concat([self.online_log, log_df], \
+                                        ignore_index=True)
+
+        self.online_scaler.partial_fit(X)
+        self.__partial_fit_online_models(X, y)
+        self.online_date_last = team_df["game_date"].max()
+        self.save_online_models()
+        self.instrumentation.log("Online models updated with " + str(X.shape[0]) \
+                                 + " games through " \
+                                 + str(self.online_date_last.date()))
+
+
+    def __partial_fit_online_models(self, X, y):
+        X_scaled = self.online_scaler.transform(X)
+        for clf_str, clf in self.online_models.items():
+            clf.partial_fit(X_scaled, y, classes=np.array([0, 1]))
+
+
+    def __read_daily_team_box(self, date_last):
+        # Reads processed daily files after `date_last` only
+        team_dfs = []
+        for season_str in sorted(os.listdir(self.proc_team_file_path)):
+            season_dir_path = self.proc_team_file_path + season_str
+            if not os.path.isdir(season_dir_path) or "=" in season_str:
+                continue
+            for file_name in sorted(os.listdir(season_dir_path)):
+                if not file_name.endswith("_team_box_scores.csv"):
+                    continue
+                file_date = pd.Timestamp(int(file_name[0:4]), \
+                                         int(file_name[5:7]), \
+                                         int(file_name[8:10]))
+                if file_date > date_last:
+                    file_path = season_dir_path + "/" + file_name
+                    team_dfs.append(pd.read_csv(file_path))
+                    self.instrumentation.count_read(file_path)
+        if not team_dfs:
+            return pd.DataFrame(columns=["game_date"])
+        return TeamBoxSchema.apply(pd.concat(team_dfs, ignore_index=True))
+
+
+    def save_online_models(self, checkpoint_path = None):
+        if checkpoint_path is None:
+            checkpoint_path = self.online_checkpoint_path
+        temp_path = checkpoint_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump({"feats": list(self.feats), "labels": list(self.labels), \
+                         "skip_playoffs": self.skip_playoffs, \
+                         "models": self.online_models, \
+                         "scaler": self.online_scaler, \
+                         "date_last": self.online_date_last, \
+                         "log": self.online_log}, \
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, checkpoint_path)
+        self.instrumentation.count_written(checkpoint_path)
+
+
+    def load_online_models(self, checkpoint_path = None):
+        if checkpoint_path is None:
+            checkpoint_path = self.online_checkpoint_path
+        with open(checkpoint_path, "rb") as f:
+            checkpoint = pickle.load(f)
+        self.feats = checkpoint["feats"]
+        self.labels = checkpoint["labels"]
+        self.skip_playoffs = checkpoint["skip_playoffs"]
+        self.online_models = checkpoint["models"]
+        self.online_scaler = checkpoint["scaler"]
+        self.online_date_last = checkpoint["date_last"]
+        self.online_log = checkpoint["log"]
+
+
+    def save_model(self, clf_str, model_path):
+        # Fits on all selected rows for serving
+        self.__set_feature_matrix()
+        clf, name = self.__get_classifier(clf_str)
+        clf = clf.fit(self.X, self.y)
+
+        model_dir_path = os.path.dirname(model_path)
+        if model_dir_path != "" and not os.path.exists(model_dir_path):
+            os.makedirs(model_dir_path)
+        temp_path = model_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump({"name": name, "model": clf, "feats": list(self.feats)}, \
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, model_path)
+
+
+    def __run_fit_jobs(self, jobs, n_jobs, fit_func = _fit_and_score):
+        if n_jobs is None or n_jobs < 1:
+            n_jobs = os.cpu_count() or 1
+        if n_jobs == 1 or len(jobs) <= 1:
+            return [fit_func(self.X, self.y, *job) for job in jobs]
+
+        # Workers memory-map the matrix and only receive fold indices
+        shared_dir_path = tempfile.mkdtemp(prefix="nba_features_")
+        try:
+            X_path = os.path.join(shared_dir_path, "X.npy")
+            y_path = os.path.join(shared_dir_path, "y.npy")
+            np.save(X_path, self.X)
+            np.save(y_path, self.y)
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                return list(executor.map(_run_shared, repeat(fit_func), \
+                                         repeat(X_path), repeat(y_path), \
+                                         *zip(*jobs)))
+        finally:
+            shutil.rmtree(shared_dir_path, ignore_errors=True)
             
             
     def plot_results(self):
+        # Plotting libraries are only needed here
+        import seaborn as sns
+        import matplotlib.pyplot as plt
         sns.set_color_codes("muted")
         fig, ax = plt.subplots(figsize=(8,4))
 
@@ -191,54 +1097,79 @@ class DataClassifier:
         plt.show()
     
     
-    def __get_classifier(self, clf_str):
-        if clf_str is "KNN":
-            clf = KNeighborsClassifier(3)
-            name = clf.__class__.__name__
-        elif clf_str is "SVC":
-            clf = SVC(kernel="rbf", C=0.025, probability=True)
-            name = clf.__class__.__name__
-        elif clf_str is "NSVC":
-            clf = NuSVC(probability=True)
-            name = clf.__class__.__name__
-        elif clf_str is "DTC":
-            clf = DecisionTreeClassifier()
-            name = clf.__class__.__name__
-        elif clf_str is "DTR":
-            clf = DecisionTreeRegressor()
-            name = clf.__class__.__name__
-        elif clf_str is "RFC":
-            clf = RandomForestClassifier()
-            name = clf.__class__.__name__
-        elif clf_str is "ABC":
-            clf = AdaBoostClassifier()
-            name = clf.__class__.__name__
-        elif clf_str is "GBC":
-            clf = GradientBoostingClassifier()
-            name = clf.__class__.__name__
-        elif clf_str is "GNB":
-            clf = GaussianNB()
-            name = clf.__class__.__name__
-        elif clf_str is "LDA":
-            clf = LinearDiscriminantAnalysis()
-            name = clf.__class__.__name__
-        elif clf_str is "QDA":
-            clf = QuadraticDiscriminantAnalysis()
-            name = clf.__class__.__name__
-        elif clf_str is "LR":
-            clf = LogisticRegression()
-            name = clf.__class__.__name__
+    def __get_classifier(self, clf_str, tuned = True):
+        if clf_str not in _classifier_registry:
+            raise ValueError("Unknown classifier: " + str(clf_str))
+        module_name, class_name, params = _classifier_registry[clf_str]
+        clf_class = getattr(importlib.import_module(module_name), class_name)
+        clf = clf_class(**params)
+        name = clf.__class__.__name__
+
+        # Applies parameters found by `search_hyperparameters`
+        if tuned and clf_str in self.best_params:
+            clf.set_params(**self.best_params[clf_str])
         
         return clf, name
         
         
+    def __set_feature_matrix(self):
+        # Contiguous float32 features and int8 labels (1 for win)
+        # of the selected seasons and games
+        self.X, self.y = self.__get_feature_arrays(self.__get_selected_rows())
+
+
+    def __get_feature_arrays(self, team_df):
+        X = np.ascontiguousarray(team_df.loc[:, self.feats] \
+                                 .to_numpy(dtype=np.float32))
+        labels = team_df.loc[:, self.labels[0]]
+        if labels.dtype.kind in "biu":
+            return X, labels.to_numpy(dtype=np.int8)
+        return X, labels.eq("win").to_numpy(dtype=np.int8)
+
+
+    def __get_split_indices(self, rng_seeds):
+        if not self.cache_splits:
+            return {rng_seed: self.__get_train_test_split(rng_seed) \
+                    for rng_seed in rng_seeds}
+
+        # Folds are identified by the data rows, labels and split settings
+        label_hash = hashlib.sha1(self.y.tobytes()).hexdigest()
+        key_str = repr((self.y.shape[0], label_hash, self.test_size, \
+                        self.start_year, self.end_year, self.skip_playoffs))
+        split_cache_file_path = self.split_cache_path \
+            + hashlib.sha1(key_str.encode()).hexdigest()[:20] + ".npz"
+
+        # Loads cached folds, computing and saving missing ones
+        folds = {}
+        if os.path.isfile(split_cache_file_path):
+            with np.load(split_cache_file_path) as npz_file:
+                folds = {name: npz_file[name] for name in npz_file.files}
+        is_updated = False
+        for rng_seed in rng_seeds:
+            if "test_" + str(rng_seed) not in folds:
+                train_index, test_index = self.__get_train_test_split(rng_seed)
+                folds["train_" + str(rng_seed)] = train_index.astype(np.int32)
+                folds["test_" + str(rng_seed)] = test_index.astype(np.int32)
+                is_updated = True
+        if is_updated:
+            if not os.path.exists(self.split_cache_path):
+                os.makedirs(self.split_cache_path)
+            temp_file_path = split_cache_file_path[:-4] + ".tmp.npz"
+            np.savez(temp_file_path, **folds)
+            os.replace(temp_file_path, split_cache_file_path)
+
+        return {rng_seed: (folds["train_" + str(rng_seed)], \
+                           folds["test_" + str(rng_seed)]) \
+                for rng_seed in rng_seeds}
+
+
     def __get_train_test_split(self, rng_seed=0):
+        from sklearn.model_selection import StratifiedShuffleSplit
         sss = StratifiedShuffleSplit(n_splits=1, test_size=self.test_size, \
                                      random_state=rng_seed)
         for train_index, test_index in sss.split(self.X, self.y):
-            X_train, X_test = self.X.iloc[train_index, :], self.X.iloc[test_index, :]
-            y_train, y_test = self.y.iloc[train_index, :], self.y.iloc[test_index, :]
-        return X_train, X_test, y_train, y_test
+            pass
+        return train_index, test_index
         
         
         
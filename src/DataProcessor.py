@@ -3,9 +3,13 @@
 integrating, and processing NBA data.
 
 Attributes:
-    update_and_process_all_data(): Runs all methods listed below
-        in the order listed.
+    update_and_process_all_data(fused): Runs all methods listed below
+        in the order listed.  With `fused=True` (default) the three
+        processing stages run as `process_team_box_fused()`.
     
+    scrape_data_season_schedule(): Scrapes season schedule data
+        for 2000-current. Places files in `data_raw` folder.
+
     scrape_data_player_box_scores(): Scrapes player box scores
         for 2000-current from the website
         https://www.basketball-reference.com/ 
@@ -14,23 +18,95 @@ Attributes:
         
     scrape_data_team_box_scores(): Scrapes team box scores for
         2000-current. Places files in `data_raw` folder.
-    
-    scrape_data_season_schedule(): Scrapes season schedule data
-        for 2000-current. Places files in `data_raw` folder.
 
-    create_processed_team_box_and_add_season_schedule(): 
+    Box scores are only requested for dates with games in the
+    season schedule (game dates as used by the schedule merge);
+    past days without scheduled games are recorded as days without
+    games once the schedule is final, and skipped until then.
+    Seasons without a scraped schedule request every day.
+
+    The scrape methods above request days concurrently through
+    `ScrapeEngine` (`n_scrape_workers` threads sharing a
+    `max_requests_per_second` rate limit, with retries).
+    `scrape_client` replaces the web scraper client, e.g., with a
+    local fake client for offline runs.  The web scraper is imported
+    by the scrape stages only, so processing local files does not
+    need it.  `scrape_base_url` sends the scraper's HTTP requests to
+    another server (e.g., a local fake server) while a scrape stage
+    runs; the scraper's default server is restored afterwards.
+
+    Responses are cached by `ScrapeCache` (gzip files in
+    `data_raw/scrape_cache/` by default, keyed by endpoint and date
+    or season).  A day counts as saved once it was fetched more
+    than `scrape_settle_days` days after its games, and a schedule
+    once fetched after its season ended; only more recent days and
+    the current schedule are requested again.  Rebuilds of raw files
+    are served from the cache without network requests.
+
+    process_team_box_fused(n_workers): Merges season schedule and adds all
+        registered derived features in memory, one season at a time,
+        writing each daily file and the complete data set once.
+
+    Every stage is timed by `instrumentation` (`StageInstrumentation`),
+    which records wall/CPU time, files and bytes read/written, rows and
+    memory per stage and season, and prints messages according to its
+    `verbosity` (per-day messages only at verbosity 3).
+
+    Progress of every stage is kept in `PipelineManifest`
+    (`data_preprocessed/pipeline_manifest.db`), which records each
+    saved file with its content hash, input hash and stage version.
+    Scrape stages only request days not yet saved; processing
+    stages only recompute dates whose inputs changed.  Seasons saved
+    with the older `season_data_status.csv` files are registered in
+    the manifest on first use.
+
+    create_processed_team_box_and_add_season_schedule(vectorized): 
         Creates `data_preprocessed` folder and merges team box
         scores with season schedule.  Adds the following data:
-        win/loss, home/away, opponent, opponent score.
+        win/loss, home/away, opponent, opponent score, season (start
+        year) and playoffs.  Games after the regular season are
+        flagged as playoffs: the regular season ends on the date
+        given in `regular_season_end_dates` for irregular seasons
+        (e.g., 2019-20), otherwise the regular season length is the
+        most common number of games per team in the schedule, and it
+        ends on the most common date of each team's last regular
+        season game.  Seasons where teams played different numbers
+        of regular season games are logged.
+        By default merges a whole season at once by joining
+        per-team schedule rows on team and game date;
+        `vectorized=False` uses the original day-by-day merge.
 
     add_fgp_tpp_tr_to_processed_team_box(): Adds derived features
         recommended by professional NBA analysts to preprocessed data.
+        Computes every feature in the derived feature registry
+        (FG%, 3P%, total rebounds by default).
+
+    register_derived_feature(name, feature_func): Adds a derived
+        feature, computed as `feature_func(team_df)` on the team box
+        scores of a date, to the registry.
 
-    write_complete_processed_team_box(): Writes single csv file
-        for classification and validation phase.
+    write_complete_processed_team_box(n_workers): Writes single csv
+        file for classification and validation phase.  Seasons are
+        read in parallel, one worker process per season, and
+        concatenated once.  Also writes a
+        typed, columnar Parquet store partitioned by season
+        (`complete_processed_team_box/season=YYYY/`) which
+        `DataClassifier.load_data` reads with column projection
+        and season/date filtering.  The data set kept in
+        `team_full_df` and the Parquet store use the compact types
+        declared in `TeamBoxSchema` (categorical teams, int8/int16
+        counts, float32 percentages, int8 outcome).
+
+    aggregate_player_box_scores(): Streams player box scores one day
+        at a time through `PlayerFeatureAggregator` and writes
+        team-game player features (minutes share, starters' usage,
+        bench scoring, missing regulars) keyed by team and game date
+        to `data_preprocessed/player_features/`, one file per season.
+        The aggregator state is saved after each season, so later
+        runs only read days after the last day processed.
 
     Requirements:
-        pandas, numpy
+        pandas, numpy, pyarrow (Parquet store)
         Web scraper utility:
             https://github.com/jaebradley/basketball_reference_web_scraper
 """
@@ -38,22 +114,111 @@ Attributes:
 import os
 import csv
 import datetime
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
-from basketball_reference_web_scraper import client
-from basketball_reference_web_scraper.data import OutputType   
+from .ScrapeEngine import ScrapeEngine
+from .ScrapeCache import ScrapeCache
+from .PipelineManifest import PipelineManifest
+from .StageInstrumentation import StageInstrumentation
+from .PlayerFeatureAggregator import PlayerFeatureAggregator
+from .TeamBoxSchema import TeamBoxSchema
+
+
+def _list_season_files(season_dir_path, file_suffix, \
+                       date_season_start, date_season_end):
+    # Lists a season directory once, returning (date, path) pairs
+    # in date order for daily files named `YYYY_MM_DD_<suffix>`
+    if not os.path.isdir(season_dir_path):
+        return []
+    season_files = []
+    for file_name in os.listdir(season_dir_path):
+        if not file_name.endswith("_" + file_suffix):
+            continue
+        file_date = datetime.date(int(file_name[0:4]), \
+                                  int(file_name[5:7]), \
+                                  int(file_name[8:10]))
+        if date_season_start <= file_date <= date_season_end:
+            season_files.append((file_date, \
+                                 os.path.join(season_dir_path, file_name)))
+    season_files.sort()
+    return season_files
+
+
+def _read_season_team_box(season_dir_path, date_season_start, date_season_end):
+    # Parses every daily team box score file of one season, returning
+    # the season data with the number of files and bytes read
+    season_files = _list_season_files(season_dir_path, "team_box_scores.csv", \
+                                      date_season_start, date_season_end)
+    team_dfs = [pd.read_csv(file_path, parse_dates=["game_date"]) \
+                for file_date, file_path in season_files]
+    n_bytes = sum([os.path.getsize(file_path) \
+                   for file_date, file_path in season_files])
+    if not team_dfs:
+        return pd.DataFrame(), 0, 0
+    return pd.concat(team_dfs, ignore_index=True), len(team_dfs), n_bytes
+
+
+def _field_goal_percentage(team_df):
+    return team_df["made_field_goals"] \
+           / (team_df["made_field_goals"] + team_df["attempted_field_goals"])
+
+
+def _three_point_percentage(team_df):
+    return team_df["made_three_point_field_goals"] \
+           / (team_df["made_three_point_field_goals"] \
+              + team_df["attempted_three_point_field_goals"])
+
+
+def _total_rebounds(team_df):
+    return team_df["offensive_rebounds"] + team_df["defensive_rebounds"]
+
 
 class DataProcessor:        
-    def __init__(self, root_dir = "data_raw", proc_dir = "data_preprocessed"):
+    def __init__(self, root_dir = "data_raw", proc_dir = "data_preprocessed", \
+                 scrape_client = None, n_scrape_workers = 8, \
+                 max_requests_per_second = 1.0, max_scrape_retries = 3, \
+                 scrape_cache_dir = None, scrape_settle_days = 3, \
+                 scrape_base_url = None, instrumentation = None):
         self.player_file_path = root_dir + "/player_box_scores/"
         self.team_file_path = root_dir + "/team_box_scores/"
         self.season_file_path = root_dir + "/season_schedule/"
         self.proc_team_file_path = proc_dir + "/team_box_scores/"
+        self.player_feature_file_path = proc_dir + "/player_features/"
         datetime_now = datetime.datetime.now()
         self.date_today = datetime.date(datetime_now.year,\
                                        datetime_now.month,\
                                        datetime_now.day)
         self.team_full_df = pd.DataFrame()
+        self.columnar_row_group_size = 1024
+        self.derived_features = {}
+        self.register_derived_feature("field_goal_percentage", \
+                                      _field_goal_percentage)
+        self.register_derived_feature("three_point_percentage", \
+                                      _three_point_percentage)
+        self.register_derived_feature("total_rebounds", _total_rebounds)
+        self.stage_versions = {"scrape_player_box_scores": 1, \
+                               "scrape_team_box_scores": 1, \
+                               "scrape_season_schedule": 1, \
+                               "merge_season_schedule": 3, \
+                               "add_fgp_tpp_tr": 1}
+        # Seasons (start year) whose regular season did not end on the
+        # most common date of each team's last regular season game
+        self.regular_season_end_dates = {2019: datetime.date(2020, 8, 14)}
+        if instrumentation is None:
+            instrumentation = StageInstrumentation()
+        self.instrumentation = instrumentation
+        self.scrape_engine = ScrapeEngine(scrape_client, \
+                                          n_workers=n_scrape_workers, \
+                                          requests_per_second=max_requests_per_second, \
+                                          max_retries=max_scrape_retries, \
+                                          instrumentation=instrumentation)
+        if scrape_cache_dir is None:
+            scrape_cache_dir = root_dir + "/scrape_cache/"
+        self.scrape_cache = ScrapeCache(scrape_cache_dir)
+        self.scrape_settle_days = scrape_settle_days
+        self.scrape_base_url = scrape_base_url
         if not os.path.exists(root_dir):
             os.mkdir(root_dir)
         if not os.path.exists(self.player_file_path):
@@ -66,263 +231,309 @@ class DataProcessor:
             os.mkdir(proc_dir)
         if not os.path.exists(self.proc_team_file_path):
             os.mkdir(self.proc_team_file_path)
+        if not os.path.exists(self.player_feature_file_path):
+            os.mkdir(self.player_feature_file_path)
+        self.manifest = PipelineManifest(proc_dir + "/pipeline_manifest.db")
             
     
-    def update_and_process_all_data():
+    def update_and_process_all_data(self, fused = True):
+        self.scrape_data_season_schedule()
         self.scrape_data_player_box_scores()
         self.scrape_data_team_box_scores()
-        self.scrape_data_season_schedule()
-        self.create_processed_team_box_and_add_season_schedule()
-        self.add_fgp_tpp_tr_to_processed_team_box()
-        self.write_complete_processed_team_box()
+        if fused:
+            self.process_team_box_fused()
+        else:
+            self.create_processed_team_box_and_add_season_schedule()
+            self.add_fgp_tpp_tr_to_processed_team_box()
+            self.write_complete_processed_team_box()
+        self.aggregate_player_box_scores()
         
 
     def scrape_data_player_box_scores(self):
-        print("\nScraping player box score data.\n")
+        self.instrumentation.log("\nScraping player box score data.\n", 1)
+        with self.instrumentation.stage("scrape_data_player_box_scores"), \
+             self.__use_scrape_base_url():
+            self.__scrape_daily_data(self.player_file_path, "player_box_scores", \
+                                     "Player box score")
+
+            
+    def scrape_data_team_box_scores(self):
+        self.instrumentation.log("\nScraping team box score data.\n", 1)
+        with self.instrumentation.stage("scrape_data_team_box_scores"), \
+             self.__use_scrape_base_url():
+            self.__scrape_daily_data(self.team_file_path, "team_box_scores", \
+                                     "Team box score")
+             
+                
+    def scrape_data_season_schedule(self):
+        self.instrumentation.log("\nScraping season schedule data.\n", 1)
+        with self.instrumentation.stage("scrape_data_season_schedule"), \
+             self.__use_scrape_base_url():
+            self.__scrape_season_schedule()
+
+
+    def __scrape_season_schedule(self):
+        stage = "scrape_season_schedule"
+        OutputType = self.__import_scraper()
         if self.date_today.month < 10:
             current_season_start_year = self.date_today.year-1
         else:
             current_season_start_year = self.date_today.year
-        year_range = range(1999, current_season_start_year+1, 1)
+        year_range = range(2000, current_season_start_year+1, 1)
+
+        season_records = self.manifest.get_stage(stage)
+        year_list = []
         for year in year_range:
             season_str = str(year) + "_" + str(year + 1)
-            if not os.path.exists(self.player_file_path + season_str):
-                os.mkdir(self.player_file_path + season_str)
-
-            status_path = self.player_file_path + season_str \
-                          + '/season_data_status.csv'
-            is_complete_season = False
-            date_season_end =  datetime.date(year+1, 6, 30)
-
-            # Avoids scraping saved season data
-            if os.path.isfile(status_path):
-                with open(status_path, newline='') as csvfile:
-                    reader = csv.reader(csvfile, delimiter=',')
-                    line_1 = next(reader)[0]
-                    if line_1 == 'complete':
-                        is_complete_season = True
-                        print("Player box score data found for season: " \
-                              + str(year) + "-" + str(year+1))
-                    elif line_1 == 'incomplete':
-                        date = next(reader)
-                        # Moves back 3 days to be certain saved data is complete
-                        date_season_current = datetime.date(int(date[0]),\
-                                                            int(date[1]),\
-                                                            int(date[2])) \
-                                              - datetime.timedelta(days = 3)
+            output_file_path = self.season_file_path \
+                + str(year) + "_" + str(year + 1) \
+                + "_" + "season_schedule.csv"
+            
+            # Schedules saved after the season ended are final
+            if season_str not in season_records \
+               and self.__is_schedule_final(year):
+                season_records[season_str] = None
+            if season_str in season_records \
+               and os.path.isfile(output_file_path):
+                self.instrumentation.log("Season schedule data found for season: " \
+                                         + str(year) + "-" + str(year+1))
             else:
-                # Starts at beginning of season
-                date_season_current = datetime.date(year, 10, 1)
-                with open(status_path, 'w', newline='') as csvfile:
-                    writer = csv.writer(csvfile, delimiter=',')
-                    writer.writerow(['incomplete'])
-                    writer.writerow([year, 10, 1])               
-                        
-            if not is_complete_season:
-                while date_season_current <= date_season_end \
-                      and date_season_current <= self.date_today:
+                year_list.append(year)
 
-                    # Creates output path
-                    if date_season_current.day < 10:
-                        day_str = "0" + str(date_season_current.day)
-                    else:
-                        day_str = str(date_season_current.day)
-                    if date_season_current.month < 10:
-                        month_str = "0" + str(date_season_current.month)
-                    else:
-                        month_str = str(date_season_current.month)
-                    output_file_path = "./" + self.player_file_path + season_str \
-                        + "/" + str(date_season_current.year) + "_" \
-                        + month_str + "_" + day_str \
-                        + "_" + "player_box_scores.csv"
-
-                    # Attempts to scrape and save data
-                    pbs = client.player_box_scores(day=date_season_current.day, \
-                                                   month=date_season_current.month, \
-                                                   year=date_season_current.year,
-                                                   output_type=OutputType.CSV,
-                                                   output_file_path=output_file_path)
-                    with open(output_file_path) as csv_file:
-                        csv_reader = csv.reader(csv_file, delimiter=',')
-                        line_count = 0
-                        for row in csv_reader:
-                            line_count += 1
-                    if line_count < 2:
-                        os.remove(output_file_path)
-                        print(str(date_season_current.year) \
-                              + "_" + month_str + "_" + day_str \
-                              + ": No games played")
-                    else:
-                        print(str(date_season_current.year) \
-                              + "_" + month_str + "_" + day_str \
-                              + ": Game data saved")
-
-                    # Logs data as saved
-                    with open(status_path, 'w', newline='') as csvfile:
-                        writer = csv.writer(csvfile, delimiter=',')
-                        writer.writerow(['incomplete'])
-                        writer.writerow([date_season_current.year, \
-                                         date_season_current.month, \
-                                         date_season_current.day])
-                        
-                    date_season_current = date_season_current \
-                                          + datetime.timedelta(days = 1)    
-                # end while
-                
-                # Logs scrape complete for previous seasons
-                if self.date_today > date_season_current:
-                    with open(status_path, 'w', newline='') as csvfile:
-                        writer = csv.writer(csvfile, delimiter=',')
-                        writer.writerow(['complete'])
+        def scrape_season(year):
+            season_str = str(year) + "_" + str(year + 1)
+            output_file_path = self.season_file_path \
+                + str(year) + "_" + str(year + 1) \
+                + "_" + "season_schedule.csv"
+            if not self.scrape_cache.load("season_schedule", season_str, \
+                                         output_file_path):
+                self.scrape_engine.fetch("season_schedule", \
+                                         season_end_year=year+1, \
+                                         output_type=OutputType.CSV, \
+                                         output_file_path=output_file_path)
+                self.scrape_cache.save("season_schedule", season_str, \
+                                       output_file_path, \
+                                       datetime.date(year+1, 6, 30))
+            is_saved = self.__remove_if_empty(output_file_path)
+            if is_saved:
+                self.instrumentation.count_written(output_file_path)
+            if is_saved:
+                self.__is_schedule_final(year)
+            return is_saved
 
-            # end if not is_complete_season
+        results, failed_years = self.scrape_engine.run(year_list, scrape_season)
+        self.manifest.commit()
+        for year, is_saved in zip(year_list, results):
+            if year in failed_years:
+                continue
+            if is_saved:
+                self.instrumentation.log("Season " + str(year) + "-" \
+                                         + str(year+1) + ": Game data saved")
+            else:
+                self.instrumentation.log("Season " + str(year) + "-" \
+                                         + str(year+1) + ": No games played")
+                   
 
-            
-    def scrape_data_team_box_scores(self):
-        print("\nScraping team box score data.\n")
+    def __scrape_daily_data(self, file_path, endpoint, data_name):
+        stage = "scrape_" + endpoint
+        OutputType = self.__import_scraper()
+        stage_version = self.stage_versions[stage]
+        file_suffix = endpoint + ".csv"
         if self.date_today.month < 10:
             current_season_start_year = self.date_today.year-1
         else:
             current_season_start_year = self.date_today.year
         year_range = range(1999, current_season_start_year+1, 1)
+
+        # Collects days not yet saved for all seasons
+        day_list = []
+        season_list = []
         for year in year_range:
             season_str = str(year) + "_" + str(year + 1)
-            if not os.path.exists(self.team_file_path + season_str):
-                os.mkdir(self.team_file_path + season_str)
-
-            status_path = self.team_file_path + season_str \
-                          + '/season_data_status.csv'
-            is_complete_season = False
+            if not os.path.exists(file_path + season_str):
+                os.mkdir(file_path + season_str)
             date_season_end =  datetime.date(year+1, 6, 30)
 
-            # Avoids scraping saved season data            
-            if os.path.isfile(status_path):
-                with open(status_path, newline='') as csvfile:
-                    reader = csv.reader(csvfile, delimiter=',')
-                    line_1 = next(reader)[0]
-                    if line_1 == 'complete':
-                        is_complete_season = True
-                        print("Team box score data found for season: " \
-                              + str(year) + "-" + str(year+1))
-                    elif line_1 == 'incomplete':
-                        date = next(reader)
-                        # Moves back 3 days to be certain saved data is complete
-                        date_season_current = datetime.date(int(date[0]),\
-                                                            int(date[1]),\
-                                                            int(date[2])) \
-                                              - datetime.timedelta(days = 3)
+            # Avoids scraping saved season data
+            season_records = self.manifest.get_stage(stage, season_str)
+            if not season_records:
+                season_records = self.__adopt_legacy_scrape_status(\
+                    stage, file_path, season_str, year, file_suffix)
+            if season_str in season_records:
+                self.instrumentation.log(data_name + " data found for season: " \
+                                         + str(year) + "-" + str(year+1))
+                continue
+
+            game_dates = self.__get_scheduled_game_dates(year)
+            if game_dates is None:
+                self.instrumentation.log("No season schedule for season: " \
+                                         + str(year) + "-" + str(year+1) \
+                                         + ", requesting every day", 2)
+            # Off-days of a schedule that can still change are checked
+            # again on the next run
+            is_schedule_final = self.__is_schedule_final(year)
+            if game_dates is None or is_schedule_final:
+                season_list.append((season_str, date_season_end))
+            date_season_current = datetime.date(year, 10, 1)
+            while date_season_current <= date_season_end \
+                  and date_season_current <= self.date_today:
+                key = season_str + "/" + date_season_current.strftime("%Y_%m_%d")
+                if key not in season_records:
+                    if game_dates is None or date_season_current in game_dates:
+                        day_list.append((season_str, date_season_current))
+                    elif is_schedule_final:
+                        # Days without games in a final schedule are
+                        # saved as days without games, without a request
+                        self.manifest.record(stage, key, None, None, \
+                                             stage_version)
+                date_season_current = date_season_current \
+                                      + datetime.timedelta(days = 1)
+
+        def scrape_day(day):
+            season_str, date = day
+            date_str = date.strftime("%Y_%m_%d")
+            output_file_path = file_path + season_str + "/" \
+                               + date_str + "_" + file_suffix
+            if not self.scrape_cache.load(endpoint, date_str, output_file_path):
+                self.scrape_engine.fetch(endpoint, day=date.day, \
+                                         month=date.month, year=date.year, \
+                                         output_type=OutputType.CSV, \
+                                         output_file_path=output_file_path)
+                self.scrape_cache.save(endpoint, date_str, output_file_path, \
+                                       date + datetime.timedelta(\
+                                           days=self.scrape_settle_days))
+            is_saved = self.__remove_if_empty(output_file_path)
+            if is_saved:
+                self.instrumentation.count_written(output_file_path)
+                self.instrumentation.log(date.strftime("%Y_%m_%d") \
+                                         + ": Game data saved", 3)
             else:
-                # Starts at beginning of season
-                date_season_current = datetime.date(year, 10, 1)
-                with open(status_path, 'w', newline='') as csvfile:
-                    writer = csv.writer(csvfile, delimiter=',')
-                    writer.writerow(['incomplete'])
-                    writer.writerow([year, 10, 1])
+                self.instrumentation.log(date.strftime("%Y_%m_%d") \
+                                         + ": No games played", 3)
 
-                        
-            if not is_complete_season:
-                while date_season_current <= date_season_end \
-                      and date_season_current <= self.date_today:
+            # Logs data as saved once it can no longer change
+            if self.scrape_cache.is_final(endpoint, date_str):
+                content_hash = None
+                if is_saved:
+                    content_hash = PipelineManifest.hash_file(output_file_path)
+                self.manifest.record(stage, season_str + "/" \
+                                     + date.strftime("%Y_%m_%d"), \
+                                     content_hash, None, stage_version)
+            return is_saved
 
-                    # Creates output path
-                    if date_season_current.day < 10:
-                        day_str = "0" + str(date_season_current.day)
-                    else:
-                        day_str = str(date_season_current.day)
-                    if date_season_current.month < 10:
-                        month_str = "0" + str(date_season_current.month)
-                    else:
-                        month_str = str(date_season_current.month)
-                        
-                    output_file_path = "./" + self.team_file_path + season_str \
-                        + "/" + str(date_season_current.year) \
-                    + "_" + month_str + "_" + day_str \
-                        + "_" + "team_box_scores.csv"
-
-                    # Attempts to scrape and save data
-                    pbs = client.team_box_scores(day=date_season_current.day, \
-                                                 month=date_season_current.month, \
-                                                 year=date_season_current.year,\
-                                                 output_type=OutputType.CSV,\
-                                                 output_file_path=output_file_path)
-                    with open(output_file_path) as csv_file:
-                        csv_reader = csv.reader(csv_file, delimiter=',')
-                        line_count = 0
-                        for row in csv_reader:
-                            line_count += 1
-                    if line_count < 2:
-                        os.remove(output_file_path)
-                        print(str(date_season_current.year) \
-                              + "_" + month_str + "_" + day_str \
-                              + ": No games played")
-                    else:
-                        print(str(date_season_current.year) \
-                              + "_" + month_str + "_" + day_str \
-                              + ": Game data saved")
-
-                            
-                    # Logs data as saved
-                    with open(status_path, 'w', newline='') as csvfile:
-                        writer = csv.writer(csvfile, delimiter=',')
-                        writer.writerow(['incomplete'])
-                        writer.writerow([date_season_current.year, \
-                                         date_season_current.month, \
-                                         date_season_current.day])
-                        
-                    date_season_current = date_season_current \
-                                          + datetime.timedelta(days = 1)    
-                # end while
-                
-                # Logs scrape complete for previous seasons
-                if self.date_today > date_season_current:
-                    with open(status_path, 'w', newline='') as csvfile:
-                        writer = csv.writer(csvfile, delimiter=',')
-                        writer.writerow(['complete'])
-
-                # end while
-            # end if not is_complete_season
-             
-                
-    def scrape_data_season_schedule(self):
-        print("\nScraping season schedule data.\n")    
-        if self.date_today.month < 10:
-            current_season_start_year = self.date_today.year-1
-        else:
-            current_season_start_year = self.date_today.year
-        year_range = range(2000, current_season_start_year+1, 1)
-        for year in year_range:
-            season_str = str(year) + "_" + str(year+1)
-            output_file_path = "./" + self.season_file_path \
-                + str(year) + "_" + str(year + 1) \
-                + "_" + "season_schedule.csv"
-            
-            if os.path.isfile(output_file_path) \
-               and self.date_today > datetime.date(year+1, 6, 30):
-                print("Season schedule data found for season: " \
-                              + str(year) + "-" + str(year+1))
+        self.scrape_engine.run(day_list, scrape_day)
+
+        # Logs scrape complete for previous seasons whose days were
+        # all settled or known from a final schedule (failed days are
+        # never settled)
+        unsettled_seasons = set([season_str for season_str, date in day_list \
+                                 if not self.scrape_cache.is_final(\
+                                     endpoint, date.strftime("%Y_%m_%d"))])
+        for season_str, date_season_end in season_list:
+            if season_str not in unsettled_seasons \
+               and self.date_today > date_season_end:
+                self.manifest.record(stage, season_str, None, None, \
+                                     stage_version)
+        self.manifest.commit()
+
+
+    def __is_schedule_final(self, year):
+        # A schedule is final once recorded by the schedule stage, or
+        # when it was fetched or saved after its season ended; final
+        # schedules found on disk are recorded
+        stage = "scrape_season_schedule"
+        season_str = str(year) + "_" + str(year + 1)
+        sch_file_path = self.season_file_path + season_str \
+                        + "_season_schedule.csv"
+        if self.manifest.get(stage, season_str) is not None:
+            return True
+        if not os.path.isfile(sch_file_path):
+            return False
+        date_saved = datetime.date.fromtimestamp(os.path.getmtime(sch_file_path))
+        if not self.scrape_cache.is_final("season_schedule", season_str) \
+           and date_saved <= datetime.date(year+1, 6, 30):
+            return False
+        self.manifest.record(stage, season_str, \
+                             PipelineManifest.hash_file(sch_file_path), \
+                             None, self.stage_versions[stage])
+        return True
+
+
+    def __get_scheduled_game_dates(self, year):
+        # Game dates of a season's schedule, None if it was not scraped
+        sch_file_path = self.season_file_path + str(year) + "_" \
+                        + str(year + 1) + "_season_schedule.csv"
+        if not os.path.isfile(sch_file_path):
+            return None
+        sch_df = pd.read_csv(sch_file_path, usecols=["start_time"], \
+                             parse_dates=["start_time"])
+        self.instrumentation.count_read(sch_file_path, sch_df.shape[0])
+
+        # Games starting before 4:00 UTC belong to the previous day
+        return set((sch_df["start_time"] - pd.Timedelta(hours=4)).dt.date)
+
+
+    def __adopt_legacy_scrape_status(self, stage, file_path, season_str, \
+                                     year, file_suffix):
+        # Registers data saved with a `season_data_status.csv` file
+        status_path = file_path + season_str + '/season_data_status.csv'
+        if not os.path.isfile(status_path):
+            return {}
+        with open(status_path, newline='') as csvfile:
+            reader = csv.reader(csvfile, delimiter=',')
+            line_1 = next(reader)[0]
+            if line_1 == 'complete':
+                is_complete_season = True
+                date_saved_end = datetime.date(year+1, 6, 30)
             else:
-                pbs = client.season_schedule(season_end_year=year+1, 
-                                output_type=OutputType.CSV, 
-                                output_file_path=output_file_path)
-                with open(output_file_path) as csv_file:
-                    csv_reader = csv.reader(csv_file, delimiter=',')
-                    line_count = 0
-                    for row in csv_reader:
-                        line_count += 1
-                if line_count < 2:
-                    os.remove(output_file_path)
-                    print("Season " + str(year) + "-" + str(year+1)\
-                          + ": No games played")
-                else:
-                    print("Season " + str(year) + "-" + str(year+1)\
-                          + ": Game data saved")
-                   
+                is_complete_season = False
+                date = next(reader)
+                # Keeps the 3 day margin used by status files
+                date_saved_end = datetime.date(int(date[0]),\
+                                               int(date[1]),\
+                                               int(date[2])) \
+                                 - datetime.timedelta(days = 4)
+
+        date_season_current = datetime.date(year, 10, 1)
+        while date_season_current <= date_saved_end:
+            date_str = date_season_current.strftime("%Y_%m_%d")
+            output_file_path = file_path + season_str + "/" + date_str \
+                               + "_" + file_suffix
+            self.manifest.record(stage, season_str + "/" + date_str, \
+                                 PipelineManifest.hash_file(output_file_path), \
+                                 None, self.stage_versions[stage])
+            date_season_current = date_season_current \
+                                  + datetime.timedelta(days = 1)
+        if is_complete_season:
+            self.manifest.record(stage, season_str, None, None, \
+                                 self.stage_versions[stage])
+        self.manifest.commit()
+        return self.manifest.get_stage(stage, season_str)
+
+
+    def __remove_if_empty(self, output_file_path):
+        with open(output_file_path) as csv_file:
+            csv_reader = csv.reader(csv_file, delimiter=',')
+            line_count = 0
+            for row in csv_reader:
+                line_count += 1
+        if line_count < 2:
+            os.remove(output_file_path)
+            return False
+        return True
+
+
+    def create_processed_team_box_and_add_season_schedule(self, vectorized = True):
+        self.instrumentation.log("\nAdding season schedule to team box scores (e.g, win/loss, home/away, opponent score).\n", 1)
+        with self.instrumentation.stage("create_processed_team_box_and_add_season_schedule"):
+            self.__merge_team_box_and_season_schedule(vectorized)
+
 
-    def create_processed_team_box_and_add_season_schedule(self):
-        status_csv_filename = 'create_processed_team_box_and_add_season_schedule.csv'
+    def __merge_team_box_and_season_schedule(self, vectorized):
+        stage = "merge_season_schedule"
+        stage_version = self.stage_versions[stage]
         
         
-        print("\nAdding season schedule to team box scores (e.g, win/loss, home/away, opponent score).\n")
         if self.date_today.month < 10:
             current_season_start_year = self.date_today.year-1
         else:
@@ -330,49 +541,50 @@ class DataProcessor:
         year_range = range(2000, current_season_start_year+1, 1)
         
         for year in year_range:
+            self.instrumentation.end_season()
             season_str = str(year) + "_" + str(year + 1)
+            season_file_path = season_str + "_season_schedule.csv"
+            if not os.path.isfile(self.season_file_path + season_file_path):
+                self.instrumentation.log("Season schedule data not found for season: " \
+                                         + str(year) + "-" + str(year+1))
+                continue
+
+            self.instrumentation.next_season(season_str)
             if not os.path.exists(self.proc_team_file_path + season_str):
                 os.mkdir(self.proc_team_file_path + season_str)
-
-            status_path = self.proc_team_file_path + season_str + '/' \
-                          + status_csv_filename
-            is_complete_season = False
             date_season_end =  datetime.date(year+1, 6, 30)
 
-            # Avoids adding saved data            
-            if os.path.isfile(status_path):
-                with open(status_path, newline='') as csvfile:
-                    reader = csv.reader(csvfile, delimiter=',')
-                    line_1 = next(reader)[0]
-                    if line_1 == 'complete':
-                        is_complete_season = True
-                        print("Merged team box score data found for season: " \
-                              + str(year) + "-" + str(year+1))
-                    elif line_1 == 'incomplete':
-                        date = next(reader)
-                        # Moves back 3 days to be certain saved data is complete
-                        date_season_current = datetime.date(int(date[0]),\
-                                                            int(date[1]),\
-                                                            int(date[2])) \
-                                              - datetime.timedelta(days = 3)
-            else:
-                # Starts at beginning of season
-                date_season_current = datetime.date(year, 10, 1)
-                with open(status_path, 'w', newline='') as csvfile:
-                    writer = csv.writer(csvfile, delimiter=',')
-                    writer.writerow(['incomplete'])
-                    writer.writerow([year, 10, 1])
-
-            
-            season_file_path = season_str + "_season_schedule.csv"
-
             # Load season schedule
             sch_df = pd.read_csv(self.season_file_path + season_file_path, \
                                  parse_dates=["start_time"])
+            self.instrumentation.count_read(self.season_file_path \
+                                            + season_file_path)
 
-            if not is_complete_season:
-                while date_season_current <= date_season_end \
-                      and date_season_current <= self.date_today:
+            # Finds dates whose team box scores or schedule changed
+            key_inputs, key_files, output_paths \
+                = self.__get_merge_inputs(season_str, year, sch_df)
+            stale_keys = self.manifest.get_stale_keys(stage, key_inputs, \
+                                                      stage_version, \
+                                                      output_paths, \
+                                                      season_str + "/")
+            if not stale_keys:
+                self.instrumentation.log("Merged team box score data found for season: " \
+                                         + str(year) + "-" + str(year+1))
+                continue
+
+            stale_files = sorted([key_files[key] for key in stale_keys])
+            if vectorized:
+                # Merges all changed dates of the season at once
+                merged_df = self.__merge_season_schedule_vectorized(sch_df, \
+                                                                    stale_files)
+                self.__write_daily_team_box(season_str, merged_df)
+                self.instrumentation.log("Season " + str(year) + "-" + str(year+1) \
+                                         + ": Data added for " \
+                                         + str(len(stale_files)) + " days")
+
+            else:
+                regular_season_end = self.__get_regular_season_end(sch_df)
+                for date_season_current, team_temp_file_path in stale_files:
                     
                     # Creates output path
                     if date_season_current.day < 10:
@@ -384,11 +596,7 @@ class DataProcessor:
                     else:
                         month_str = str(date_season_current.month)                        
                                         
-                    team_temp_file_path = "./" + self.team_file_path + season_str \
-                        + "/" + str(date_season_current.year) \
-                        + "_" + month_str + "_" + day_str + "_" \
-                        + "team_box_scores.csv"
-                    processed_temp_file_path = "./" + self.proc_team_file_path \
+                    processed_temp_file_path = self.proc_team_file_path \
                         + season_str + "/" + str(date_season_current.year) \
                         + "_" + month_str + "_" + day_str + "_" \
                         + "team_box_scores.csv"
@@ -398,6 +606,8 @@ class DataProcessor:
                         
                         # Loads team box scores for specific date
                         team_df = pd.read_csv(team_temp_file_path)
+                        self.instrumentation.count_read(team_temp_file_path, \
+                                                        team_df.shape[0])
 
                         
                         # Adds date to processed data
@@ -427,9 +637,10 @@ class DataProcessor:
                         pts_total_2 = sch_df_temp["away_team_score"].sum() \
                                         + sch_df_temp["home_team_score"].sum()
                         if not pts_total_1 == pts_total_2:
-                            print("FAILED TO MERGE data for date: ", time_start, \
-                                  " with team box points: ", pts_total_1, \
-                                  " not equal to season schedule points: ", pts_total_2)
+                            self.instrumentation.log("FAILED TO MERGE data for date: " \
+                                + str(time_start) + " with team box points: " \
+                                + str(pts_total_1) + " not equal to season " \
+                                + "schedule points: " + str(pts_total_2), 1)
 
                         # Adds data by iterating through team and schedule rows
                         n_sch_rows = sch_df_temp.shape[0]
@@ -485,44 +696,179 @@ class DataProcessor:
                                     team_df.loc[i, "opponent"] = home_team
                                     team_df.loc[i, "opponent_score"] = home_team_score
 
+                        # Adds season and playoff flag
+                        team_df["season"] = year
+                        team_df["playoffs"] = date_season_current > regular_season_end
+
                         # Saves data to csv file
                         team_df.to_csv(processed_temp_file_path, index=False)
+                        self.instrumentation.count_written(processed_temp_file_path)
                         
-                        print(str(date_season_current.year) \
-                              + "_" + month_str + "_" + day_str \
-                              + ": Data added")
+                        self.instrumentation.log(str(date_season_current.year) \
+                                                 + "_" + month_str + "_" + day_str \
+                                                 + ": Data added", 3)
                         
-                        # Logs data as saved
-                        with open(status_path, 'w', newline='') as csvfile:
-                            writer = csv.writer(csvfile, delimiter=',')
-                            writer.writerow(['incomplete'])
-                            writer.writerow([date_season_current.year, \
-                                             date_season_current.month, \
-                                             date_season_current.day])
-
-                    else:
-                        print(str(date_season_current.year) \
-                              + "_" + month_str + "_" + day_str \
-                              + ": No games played")
-                            
-                    date_season_current = date_season_current \
-                                          + datetime.timedelta(days = 1) 
-
-                # end while
-                
-                # Logs scrape complete for previous seasons
-                if self.date_today > date_season_current:
-                    with open(status_path, 'w', newline='') as csvfile:
-                        writer = csv.writer(csvfile, delimiter=',')
-                        writer.writerow(['complete'])
-            # end if not is_complete_season
+            # Logs data as saved
+            for key in stale_keys:
+                self.manifest.record(stage, key, \
+                                     PipelineManifest.hash_file(output_paths[key]), \
+                                     key_inputs[key], stage_version)
+            self.manifest.commit()
                     
                 
+    def __get_merge_inputs(self, season_str, year, sch_df):
+        raw_files = _list_season_files(self.team_file_path + season_str, \
+                                       "team_box_scores.csv", \
+                                       datetime.date(year, 10, 1), \
+                                       min(datetime.date(year+1, 6, 30), \
+                                           self.date_today))
+        sch_day_hash = self.__hash_schedule_days(sch_df)
+        key_inputs = {}
+        key_files = {}
+        output_paths = {}
+        for file_date, file_path in raw_files:
+            key = season_str + "/" + file_date.strftime("%Y_%m_%d")
+            input_str = PipelineManifest.hash_file(file_path) + ":" \
+                        + str(sch_day_hash.get(file_date, 0))
+            key_inputs[key] = PipelineManifest.hash_bytes(input_str.encode())
+            key_files[key] = (file_date, file_path)
+            output_paths[key] = self.proc_team_file_path + season_str \
+                                + "/" + os.path.basename(file_path)
+        return key_inputs, key_files, output_paths
+
+
+    def __get_derived_input(self, merged_content_hash):
+        # Derived features depend on merged data and registered features
+        input_str = str(merged_content_hash) + ":" \
+                    + ",".join(self.derived_features.keys())
+        return PipelineManifest.hash_bytes(input_str.encode())
+
+
+    def __hash_schedule_days(self, sch_df):
+        # Hashes the schedule rows of each game date
+        game_date = (sch_df["start_time"] - pd.Timedelta(hours=4)).dt.date
+        row_hash = pd.util.hash_pandas_object(sch_df, index=False)
+        return row_hash.groupby(game_date).sum().to_dict()
+
+
+    def __merge_season_schedule_vectorized(self, sch_df, season_files):
+        # Loads all team box scores of the season, adding game dates
+        team_dfs = []
+        for file_date, file_path in season_files:
+            team_df = pd.read_csv(file_path)
+            self.instrumentation.count_read(file_path, team_df.shape[0])
+            team_df["game_date"] = file_date
+            team_dfs.append(team_df)
+        team_season_df = pd.concat(team_dfs, ignore_index=True)
+
+        # Games starting before 4:00 UTC belong to the previous day
+        sch_df = sch_df.copy()
+        sch_df["game_date"] \
+            = (sch_df["start_time"] - pd.Timedelta(hours=4)).dt.date
+        home_score = sch_df["home_team_score"]
+        away_score = sch_df["away_team_score"]
+
+        # Reshapes schedule into one row per team and game
+        home_df = pd.DataFrame({"game_date": sch_df["game_date"], \
+                                "team": sch_df["home_team"], \
+                                "location": "home", \
+                                "outcome": np.where(home_score > away_score, \
+                                                    "win", "loss"), \
+                                "game_score": home_score, \
+                                "opponent": sch_df["away_team"], \
+                                "opponent_score": away_score})
+        away_df = pd.DataFrame({"game_date": sch_df["game_date"], \
+                                "team": sch_df["away_team"], \
+                                "location": "away", \
+                                "outcome": np.where(home_score < away_score, \
+                                                    "win", "loss"), \
+                                "game_score": away_score, \
+                                "opponent": sch_df["home_team"], \
+                                "opponent_score": home_score})
+        games_df = pd.concat([home_df, away_df], ignore_index=True) \
+                     .drop_duplicates(subset=["game_date", "team"], keep="last")
+        games_df["game_score"] = games_df["game_score"].astype(float)
+        games_df["opponent_score"] = games_df["opponent_score"].astype(float)
+        regular_season_end = self.__get_regular_season_end(sch_df)
+        games_df["season"] = regular_season_end.year - 1
+        games_df["playoffs"] = games_df["game_date"] > regular_season_end
+
+        # Verifies games match for every date in a single grouped comparison
+        team_pts = team_season_df["made_free_throws"] \
+                   + 2*team_season_df["made_field_goals"] \
+                   + team_season_df["made_three_point_field_goals"]
+        pts_total_1 = team_pts.groupby(team_season_df["game_date"]).sum()
+        pts_total_2 = (away_score.fillna(0) + home_score.fillna(0)) \
+                        .groupby(sch_df["game_date"]).sum() \
+                        .reindex(pts_total_1.index, fill_value=0)
+        for date in pts_total_1.index[pts_total_1 != pts_total_2]:
+            self.instrumentation.log("FAILED TO MERGE data for date: " + str(date) \
+                                     + " with team box points: " \
+                                     + str(pts_total_1[date]) + " not equal to " \
+                                     + "season schedule points: " \
+                                     + str(pts_total_2[date]), 1)
+
+        return team_season_df.merge(games_df, on=["game_date", "team"], \
+                                    how="left")
+
+
+    def __get_regular_season_end(self, sch_df):
+        game_date = (sch_df["start_time"] - pd.Timedelta(hours=4)).dt.date
+        team_games_df = pd.DataFrame({"game_date": pd.concat([game_date, game_date]), \
+                                      "team": pd.concat([sch_df["home_team"], \
+                                                         sch_df["away_team"]])}) \
+                          .sort_values("game_date", kind="mergesort")
+        year = game_date.min().year
+        if year in self.regular_season_end_dates:
+            regular_season_end = self.regular_season_end_dates[year]
+        else:
+            # Games per team in the regular season is the most common
+            # count, as teams missing the playoffs play only regular
+            # season games
+            n_games = team_games_df.groupby("team").size().mode().max()
+
+            # Most teams play their last regular season game on the last day
+            last_games = team_games_df.groupby("team").nth(n_games - 1)
+            regular_season_end = last_games["game_date"].mode().max()
+
+        # Warns when teams played different numbers of regular season
+        # games, as the playoff flags may be wrong for such seasons
+        n_team_games = team_games_df.loc[team_games_df["game_date"] \
+                                         <= regular_season_end] \
+                                    .groupby("team").size()
+        if n_team_games.nunique() > 1:
+            self.instrumentation.log("Regular season game counts differ " \
+                                     + "between teams (" \
+                                     + str(n_team_games.min()) + " to " \
+                                     + str(n_team_games.max()) \
+                                     + ") for season: " + str(year) + "-" \
+                                     + str(year+1) + ", regular season end: " \
+                                     + str(regular_season_end), 1)
+        return regular_season_end
+
+
+    def __write_daily_team_box(self, season_str, season_df, file_dates = None):
+        # Saves data to one csv file per date
+        for file_date, team_df in season_df.groupby("game_date", sort=False):
+            if file_dates is not None and file_date not in file_dates:
+                continue
+            processed_temp_file_path = self.proc_team_file_path + season_str \
+                + "/" + file_date.strftime("%Y_%m_%d") + "_team_box_scores.csv"
+            team_df.to_csv(processed_temp_file_path, index=False)
+            self.instrumentation.count_written(processed_temp_file_path)
+
+
     def add_fgp_tpp_tr_to_processed_team_box(self):
-        status_csv_filename = 'add_fgp_tpp_tr_to_processed_team_box.csv'
+        self.instrumentation.log("\nAdding FG%, 3P%, total rebounds to team box scores.\n", 1)
+        with self.instrumentation.stage("add_fgp_tpp_tr_to_processed_team_box"):
+            self.__add_derived_features_to_processed_team_box()
+
+
+    def __add_derived_features_to_processed_team_box(self):
+        stage = "add_fgp_tpp_tr"
+        stage_version = self.stage_versions[stage]
         
         
-        print("\nAdding FG%, 3P%, total rebounds to team box scores.\n")
         if self.date_today.month < 10:
             current_season_start_year = self.date_today.year-1
         else:
@@ -530,160 +876,353 @@ class DataProcessor:
         year_range = range(2000, current_season_start_year+1, 1)
                 
         for year in year_range:
+            self.instrumentation.end_season()
             season_str = str(year) + "_" + str(year + 1)
+
+            # Finds dates whose merged team box scores changed
+            merged_records = self.manifest.get_stage("merge_season_schedule", \
+                                                     season_str + "/")
+            key_inputs = {key: self.__get_derived_input(rec["content_hash"]) \
+                          for key, rec in merged_records.items()}
+            output_paths = {key: self.proc_team_file_path + key \
+                                 + "_team_box_scores.csv" \
+                            for key in merged_records}
+            stale_keys = self.manifest.get_stale_keys(stage, key_inputs, \
+                                                      stage_version, \
+                                                      output_paths, \
+                                                      season_str + "/")
+            if not stale_keys:
+                self.instrumentation.log("Data found in team box scores for season: " \
+                                         + str(year) + "-" + str(year+1))
+                continue
+
+            self.instrumentation.next_season(season_str)
+            for key in sorted(stale_keys):
+                processed_temp_file_path = output_paths[key]
+                    
+                # Loads team box scores for specific date
+                team_df = pd.read_csv(processed_temp_file_path)
+                self.instrumentation.count_read(processed_temp_file_path, \
+                                                team_df.shape[0])
+
+                # Adds FG%, 3P%, total rebounds and other registered features
+                team_df = self.__add_derived_features(team_df)
+                
+                # Saves data to csv file
+                team_df.to_csv(processed_temp_file_path, index=False)
+                self.instrumentation.count_written(processed_temp_file_path)
+
+                # Logs data as saved
+                self.manifest.record(stage, key, \
+                                     PipelineManifest.hash_file(processed_temp_file_path), \
+                                     key_inputs[key], stage_version)
+
+            self.instrumentation.log("Season " + str(year) + "-" + str(year+1) \
+                                     + ": Data added for " + str(len(stale_keys)) \
+                                     + " days")
+            self.manifest.commit()
+          
+        
+    def register_derived_feature(self, name, feature_func):
+        self.derived_features[name] = feature_func
+
+
+    def __add_derived_features(self, team_df):
+        for name, feature_func in self.derived_features.items():
+            team_df[name] = feature_func(team_df)
+        return team_df
+
+
+    def process_team_box_fused(self, n_workers = None):
+        self.instrumentation.log("\nMerging season schedule and adding derived features to team box scores.\n", 1)
+        with self.instrumentation.stage("process_team_box_fused"):
+            self.__process_team_box_fused(n_workers)
+
+
+    def __process_team_box_fused(self, n_workers):
+        merge_stage = "merge_season_schedule"
+        derived_stage = "add_fgp_tpp_tr"
+
+        if self.date_today.month < 10:
+            current_season_start_year = self.date_today.year-1
+        else:
+            current_season_start_year = self.date_today.year
+        year_range = range(2000, current_season_start_year+1, 1)
+
+        season_dfs = []
+        saved_season_args = []
+        for year in year_range:
+            # Ends the previous season, so seasons skipped below are not
+            # timed with it
+            self.instrumentation.end_season()
+            season_str = str(year) + "_" + str(year + 1)
+            season_file_path = season_str + "_season_schedule.csv"
+            if not os.path.isfile(self.season_file_path + season_file_path):
+                self.instrumentation.log("Season schedule data not found for season: " \
+                                         + str(year) + "-" + str(year+1))
+                continue
+
+            self.instrumentation.next_season(season_str)
             if not os.path.exists(self.proc_team_file_path + season_str):
                 os.mkdir(self.proc_team_file_path + season_str)
+            date_season_end = min(datetime.date(year+1, 6, 30), self.date_today)
 
-            status_path = self.proc_team_file_path + season_str + '/' \
-                          + status_csv_filename
-            is_complete_season = False
-            date_season_end =  datetime.date(year+1, 6, 30)
+            # Load season schedule
+            sch_df = pd.read_csv(self.season_file_path + season_file_path, \
+                                 parse_dates=["start_time"])
+            self.instrumentation.count_read(self.season_file_path \
+                                            + season_file_path)
 
-            # Avoids adding saved data            
-            if os.path.isfile(status_path):
-                with open(status_path, newline='') as csvfile:
-                    reader = csv.reader(csvfile, delimiter=',')
-                    line_1 = next(reader)[0]
-                    if line_1 == 'complete':
-                        is_complete_season = True
-                        print("Data found in team box scores for season: " \
-                              + str(year) + "-" + str(year+1))
-                    elif line_1 == 'incomplete':
-                        date = next(reader)
-                        # Moves back 3 days to be certain saved data is complete
-                        date_season_current = datetime.date(int(date[0]),\
-                                                            int(date[1]),\
-                                                            int(date[2])) \
-                                              - datetime.timedelta(days = 3)
-            else:
-                # Starts at beginning of season
-                date_season_current = datetime.date(year, 10, 1)
-                with open(status_path, 'w', newline='') as csvfile:
-                    writer = csv.writer(csvfile, delimiter=',')
-                    writer.writerow(['incomplete'])
-                    writer.writerow([year, 10, 1])
+            # Finds dates whose inputs changed for either stage
+            key_inputs, key_files, output_paths \
+                = self.__get_merge_inputs(season_str, year, sch_df)
+            merge_stale_keys \
+                = self.manifest.get_stale_keys(merge_stage, key_inputs, \
+                                               self.stage_versions[merge_stage], \
+                                               output_paths, season_str + "/")
+            merged_records = self.manifest.get_stage(merge_stage, season_str + "/")
+            derived_inputs \
+                = {key: self.__get_derived_input(merged_records[key]["content_hash"]) \
+                   for key in key_inputs \
+                   if key in merged_records and key not in merge_stale_keys}
+            derived_stale_keys \
+                = self.manifest.get_stale_keys(derived_stage, derived_inputs, \
+                                               self.stage_versions[derived_stage], \
+                                               output_paths, season_str + "/")
+            stale_keys = sorted(set(merge_stale_keys) | set(derived_stale_keys))
 
+            if not stale_keys:
+                self.instrumentation.log("Processed team box score data found for season: " \
+                                         + str(year) + "-" + str(year+1))
+                # Saved seasons are read in parallel below
+                season_dfs.append((year, None))
+                saved_season_args.append((self.proc_team_file_path + season_str, \
+                                          datetime.date(year, 10, 1), \
+                                          date_season_end))
+                continue
 
-            if not is_complete_season:
-                while date_season_current <= date_season_end \
-                      and date_season_current <= self.date_today:
-                    
-                    # Creates output path
-                    if date_season_current.day < 10:
-                        day_str = "0" + str(date_season_current.day)
-                    else:
-                        day_str = str(date_season_current.day)
-                    if date_season_current.month < 10:
-                        month_str = "0" + str(date_season_current.month)
-                    else:
-                        month_str = str(date_season_current.month)                        
-                    
-                    processed_temp_file_path = "./" + self.proc_team_file_path \
-                        + season_str + "/" + str(date_season_current.year) \
-                        + "_" + month_str + "_" + day_str + "_" \
-                        + "team_box_scores.csv"
-                    
-                    # Checks if team box score data exists for merging
-                    if os.path.exists(processed_temp_file_path):
-                        
-                        # Loads team box scores for specific date
-                        team_df = pd.read_csv(processed_temp_file_path)
+            # Merges schedule and adds derived features in memory
+            season_df = self.__merge_season_schedule_vectorized(\
+                sch_df, sorted(key_files.values()))
+            season_df = self.__add_derived_features(season_df)
 
-                        
-                        # Adds FG%, 3P%, total rebounds to team box scores
-                        team_df["field_goal_percentage"] \
-                            = team_df["made_field_goals"] \
-                              / (team_df["made_field_goals"] \
-                                 + team_df["attempted_field_goals"])
-                        team_df["three_point_percentage"] \
-                            = team_df["made_three_point_field_goals"] \
-                              / (team_df["made_three_point_field_goals"] \
-                                 + team_df["attempted_three_point_field_goals"])
-                        team_df["total_rebounds"] \
-                            = team_df["offensive_rebounds"] \
-                              + team_df["defensive_rebounds"]
-                        
-                        # Saves data to csv file
-                        team_df.to_csv(processed_temp_file_path, index=False)
-                        
-                        print(str(date_season_current.year) \
-                              + "_" + month_str + "_" + day_str \
-                              + ": Data added")
-                        
-                        # Logs data as saved
-                        with open(status_path, 'w', newline='') as csvfile:
-                            writer = csv.writer(csvfile, delimiter=',')
-                            writer.writerow(['incomplete'])
-                            writer.writerow([date_season_current.year, \
-                                             date_season_current.month, \
-                                             date_season_current.day])
+            # Saves each changed date once
+            self.__write_daily_team_box(season_str, season_df, \
+                                        set([key_files[key][0] \
+                                             for key in stale_keys]))
+            for key in stale_keys:
+                content_hash = PipelineManifest.hash_file(output_paths[key])
+                self.manifest.record(merge_stage, key, content_hash, \
+                                     key_inputs[key], \
+                                     self.stage_versions[merge_stage])
+                self.manifest.record(derived_stage, key, content_hash, \
+                                     self.__get_derived_input(content_hash), \
+                                     self.stage_versions[derived_stage])
+            self.manifest.commit()
+            self.instrumentation.log("Season " + str(year) + "-" + str(year+1) \
+                                     + ": Data added for " + str(len(stale_keys)) \
+                                     + " days")
 
-                    else:
-                        print(str(date_season_current.year) \
-                              + "_" + month_str + "_" + day_str \
-                              + ": No games played")
-                            
-                    date_season_current = date_season_current \
-                                          + datetime.timedelta(days = 1) 
-
-                # end while
-                
-                # Logs scrape complete for previous seasons
-                if self.date_today > date_season_current:
-                    with open(status_path, 'w', newline='') as csvfile:
-                        writer = csv.writer(csvfile, delimiter=',')
-                        writer.writerow(['complete'])
-            # end if not is_complete_season
-          
-        
-    def write_complete_processed_team_box(self):
-        print("\nCombining processed box score data.\n")
-        
-        processed_complete_file_path = "./" + self.proc_team_file_path \
-                                       + "complete_processed_team_box.csv"
-        
+            season_df["game_date"] = pd.to_datetime(season_df["game_date"])
+            season_dfs.append((year, season_df))
+
+        self.instrumentation.end_season()
+        self.instrumentation.log("\nCombining processed box score data.\n", 1)
+        if saved_season_args:
+            if n_workers is None:
+                n_workers = os.cpu_count() or 1
+            n_workers = max(1, min(n_workers, len(saved_season_args)))
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                saved_season_dfs = []
+                for season_df, n_files, n_bytes in executor.map(\
+                        _read_season_team_box, *zip(*saved_season_args)):
+                    self.instrumentation.add_counts(files_read=n_files, \
+                                                    bytes_read=n_bytes, \
+                                                    rows=season_df.shape[0])
+                    saved_season_dfs.append(season_df)
+            season_dfs = [(year, season_df if season_df is not None \
+                                 else saved_season_dfs.pop(0)) \
+                          for year, season_df in season_dfs]
+        self.__write_complete_outputs(season_dfs)
+
+
+    def write_complete_processed_team_box(self, n_workers = None):
+        self.instrumentation.log("\nCombining processed box score data.\n", 1)
+        with self.instrumentation.stage("write_complete_processed_team_box"):
+            self.__write_complete_processed_team_box(n_workers)
+
+
+    def __write_complete_processed_team_box(self, n_workers):
         if self.date_today.month < 10:
             current_season_start_year = self.date_today.year-1
         else:
             current_season_start_year = self.date_today.year
         year_range = range(2000, current_season_start_year+1, 1)
         
+        # Reads each season in its own worker process
+        season_args = []
         for year in year_range:
-            print("Loading game data for season " + str(year)\
-                  + "-" + str(year+1))
             season_str = str(year) + "_" + str(year + 1)
-            date_season_current = datetime.date(year, 10, 1)
-            date_season_end =  datetime.date(year+1, 6, 30)
-            
-            while date_season_current <= date_season_end \
-                and date_season_current <= self.date_today:
-
-                # Creates output path
-                if date_season_current.day < 10:
-                    day_str = "0" + str(date_season_current.day)
-                else:
-                    day_str = str(date_season_current.day)
-                if date_season_current.month < 10:
-                    month_str = "0" + str(date_season_current.month)
-                else:
-                    month_str = str(date_season_current.month)
-
-                processed_temp_file_path = "./" + self.proc_team_file_path \
-                    + season_str + "/" + str(date_season_current.year) \
-                    + "_" + month_str + "_" + day_str + "_" + "team_box_scores.csv"
-
-                if os.path.exists(processed_temp_file_path):
-                    team_df = pd.read_csv(processed_temp_file_path)
-                    self.team_full_df \
-                      = pd.concat([self.team_full_df, team_df]).reset_index(drop=True)
-                    
-                date_season_current = date_season_current \
-                                      + datetime.timedelta(days = 1)
-        # end for year in year_range
+            season_dir_path = self.proc_team_file_path + season_str
+            date_season_end = min(datetime.date(year+1, 6, 30), self.date_today)
+            season_args.append((season_dir_path, \
+                                datetime.date(year, 10, 1), \
+                                date_season_end))
+
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        n_workers = max(1, min(n_workers, len(season_args)))
+
+        season_dfs = []
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            season_results = executor.map(_read_season_team_box, \
+                                          *zip(*season_args))
+            for year, (season_df, n_files, n_bytes) in zip(year_range, \
+                                                           season_results):
+                self.instrumentation.add_counts(files_read=n_files, \
+                                                bytes_read=n_bytes, \
+                                                rows=season_df.shape[0])
+                self.instrumentation.log("Loaded game data for season " \
+                                         + str(year) + "-" + str(year+1), 3)
+                season_dfs.append((year, season_df))
+
+        self.__write_complete_outputs(season_dfs)
+
+
+    def __write_complete_outputs(self, season_dfs):
+        processed_complete_file_path = self.proc_team_file_path \
+                                       + "complete_processed_team_box.csv"
+
+        # Concatenates once in season and date order
+        self.team_full_df = pd.concat([season_df for year, season_df \
+                                       in season_dfs], ignore_index=True)
         
         # Saves single csv with all data
         self.team_full_df.to_csv(processed_complete_file_path, index=False)
+        self.instrumentation.count_written(processed_complete_file_path)
+        self.team_full_df = TeamBoxSchema.apply(self.team_full_df)
+
+        # Saves columnar store with one partition per season
+        self.__write_columnar_processed_team_box(season_dfs)
+
+
+    def __import_scraper(self):
+        # The web scraper is only imported by the scrape stages, and
+        # its client only used when no `scrape_client` was passed
+        from basketball_reference_web_scraper.data import OutputType
+        if self.scrape_engine.client is None:
+            from basketball_reference_web_scraper import client
+            self.scrape_engine.client = client
+        return OutputType
+
+
+    @contextmanager
+    def __use_scrape_base_url(self):
+        # Sends the scraper's requests to `scrape_base_url` (e.g., a
+        # local fake server) during one scrape stage.  The scraper
+        # builds its HTTP service per request, so its base URL is set
+        # for the stage and restored afterwards
+        if self.scrape_base_url is None:
+            yield
+            return
+        from basketball_reference_web_scraper.http_service import HTTPService
+        base_url = HTTPService.BASE_URL
+        HTTPService.BASE_URL = self.scrape_base_url
+        try:
+            yield
+        finally:
+            HTTPService.BASE_URL = base_url
+
+
+    def __write_columnar_processed_team_box(self, season_dfs):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        columnar_dir_path = self.proc_team_file_path \
+                            + "complete_processed_team_box/"
+        if not os.path.exists(columnar_dir_path):
+            os.mkdir(columnar_dir_path)
+
+        for year, season_df in season_dfs:
+            if season_df.shape[0] == 0:
+                continue
+            partition_path = columnar_dir_path + "season=" + str(year) + "/"
+            if not os.path.exists(partition_path):
+                os.mkdir(partition_path)
+
+            # Stores dates as date32 so date filters can be pushed down,
+            # with seasons stored in the partition path
+            season_df = TeamBoxSchema.apply(season_df) \
+                                     .drop(columns=["season"], errors="ignore")
+            season_df["game_date"] = season_df["game_date"].dt.date
+            table = pa.Table.from_pandas(season_df, preserve_index=False)
+
+            # Rows are in date order, so small row groups carry
+            # useful min/max date statistics
+            pq.write_table(table, partition_path + "part-0.parquet", \
+                           row_group_size=self.columnar_row_group_size)
+            self.instrumentation.count_written(partition_path + "part-0.parquet")
+        
         
         
         
-        
\ No newline at end of file
+
+
+    def aggregate_player_box_scores(self):
+        self.instrumentation.log("\nAggregating player box scores into team features.\n", 1)
+        with self.instrumentation.stage("aggregate_player_box_scores"):
+            self.__aggregate_player_box_scores()
+
+
+    def __aggregate_player_box_scores(self):
+        state_path = self.player_feature_file_path + "player_state.pkl"
+        aggregator = PlayerFeatureAggregator()
+        if os.path.isfile(state_path):
+            aggregator.load_state(state_path)
+
+        if self.date_today.month < 10:
+            current_season_start_year = self.date_today.year-1
+        else:
+            current_season_start_year = self.date_today.year
+        year_range = range(2000, current_season_start_year+1, 1)
+
+        for year in year_range:
+            self.instrumentation.end_season()
+            season_str = str(year) + "_" + str(year + 1)
+            season_files = _list_season_files(self.player_file_path + season_str, \
+                                              "player_box_scores.csv", \
+                                              datetime.date(year, 10, 1), \
+                                              min(datetime.date(year+1, 6, 30), \
+                                                  self.date_today))
+
+            # Only days after the last day in the state are read
+            new_files = [(file_date, file_path) \
+                         for file_date, file_path in season_files \
+                         if aggregator.date_last is None \
+                         or pd.Timestamp(file_date) > aggregator.date_last]
+            if not new_files:
+                self.instrumentation.log("Player features found for season: " \
+                                         + str(year) + "-" + str(year+1))
+                continue
+
+            self.instrumentation.next_season(season_str)
+            season_feature_dfs = []
+            for file_date, file_path in new_files:
+                player_df = pd.read_csv(file_path)
+                self.instrumentation.count_read(file_path, player_df.shape[0])
+                season_feature_dfs.append(aggregator.update(player_df, file_date))
+                self.instrumentation.log(file_date.strftime("%Y_%m_%d") \
+                                         + ": Player features added", 3)
+
+            # Appends new days to the season file
+            output_file_path = self.player_feature_file_path + season_str \
+                               + "_player_features.csv"
+            is_new_file = len(new_files) == len(season_files) \
+                          or not os.path.isfile(output_file_path)
+            pd.concat(season_feature_dfs, ignore_index=True) \
+              .to_csv(output_file_path, index=False, \
+                      mode="w" if is_new_file else "a", header=is_new_file)
+            self.instrumentation.count_written(output_file_path)
+            aggregator.save_state(state_path)
+            self.instrumentation.log("Season " + str(year) + "-" + str(year+1) \
+                                     + ": Player features added for " \
+                                     + str(len(new_files)) + " days")
@@ -0,0 +1,73 @@
+"""
+`MatchupFeatures` class pairs every team-game row with its
+opponent's row of the same game and computes matchup differential
+and ratio features (e.g., rebound margin, turnover differential,
+shooting gap).
+
+Opponent rows are found with an index on (game_date, team), looked
+up with (game_date, opponent) for all rows at once, so the whole
+history is processed in one vectorized pass.
+
+Attributes:
+    compute(team_df): Returns matchup features for every row of
+        `team_df` (e.g., `complete_processed_team_box`), in row
+        order.  Rows whose opponent row is not in `team_df` get NaN.
+
+    get_opponent_positions(team_df): Returns the position of each
+        row's opponent row in `team_df` (-1 if missing).
+
+    Features are named `<stat>_diff` (team minus opponent) and
+    `<stat>_ratio` (team over opponent, NaN when the opponent's value
+    is 0).  Any numeric column can be used as a stat, including
+    pre-game features from `RollingFeatureEngine`.
+
+    Requirements:
+        pandas, numpy
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class MatchupFeatures:
+    def __init__(self, stats = ["field_goal_percentage", \
+                                "three_point_percentage", \
+                                "made_free_throws", \
+                                "offensive_rebounds", \
+                                "defensive_rebounds", \
+                                "total_rebounds", \
+                                "assists", \
+                                "steals", \
+                                "blocks", \
+                                "turnovers", \
+                                "personal_fouls"]):
+        self.stats = list(stats)
+        self.feats = [stat + "_diff" for stat in self.stats] \
+                     + [stat + "_ratio" for stat in self.stats]
+
+
+    def compute(self, team_df):
+        opponent_pos = self.get_opponent_positions(team_df)
+        has_opponent = opponent_pos >= 0
+
+        values = team_df.loc[:, self.stats].to_numpy(dtype=np.float64)
+        opponent_values = np.full(values.shape, np.nan)
+        opponent_values[has_opponent] = values[opponent_pos[has_opponent]]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = values/opponent_values
+        ratios[~np.isfinite(ratios)] = np.nan
+
+        return pd.DataFrame(np.hstack([values - opponent_values, ratios]), \
+                            columns=self.feats, index=team_df.index)
+
+
+    def get_opponent_positions(self, team_df):
+        # Each team plays at most once per day, so (game_date, team) is unique
+        game_index = pd.MultiIndex.from_arrays([team_df["game_date"], \
+                                                team_df["team"]])
+        if not game_index.is_unique:
+            raise ValueError("Duplicate (game_date, team) rows in team box scores.")
+        opponent_index = pd.MultiIndex.from_arrays([team_df["game_date"], \
+                                                    team_df["opponent"]])
+        return game_index.get_indexer(opponent_index)
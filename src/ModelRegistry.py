@@ -0,0 +1,97 @@
+"""
+`ModelRegistry` class stores fitted estimators and their metrics on
+disk under a hash of everything that determines them (features,
+labels, data snapshot, classifier spec, split seeds), so reruns
+load models instead of fitting them again.  Entries are evicted in
+least-recently-used order once the registry exceeds its disk
+budget or entry limit.
+
+Attributes:
+    get_key(spec): Hashes a spec (any object with a stable `repr`,
+        e.g., lists, tuples, sorted parameter items).
+
+    load(key): Returns the stored entry or None.  Marks the entry
+        as recently used.
+
+    save(key, entry): Stores an entry (e.g., a dict of fitted models
+        and metrics) and evicts old entries if needed.
+
+    evict(): Removes least recently used entries until the registry
+        fits in `max_bytes` and `max_entries`.
+
+    Requirements:
+        Python standard library (pickle, hashlib)
+"""
+
+import os
+import time
+import pickle
+import hashlib
+
+
+class ModelRegistry:
+    def __init__(self, registry_dir, max_bytes = 2*1024**3, max_entries = None):
+        self.registry_dir = registry_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+
+    @staticmethod
+    def get_key(spec):
+        return hashlib.sha1(repr(spec).encode()).hexdigest()
+
+
+    def load(self, key):
+        entry_path = self.__get_entry_path(key)
+        if not os.path.isfile(entry_path):
+            return None
+        try:
+            with open(entry_path, "rb") as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+        # Access time is kept in the file modification time
+        time_now = time.time()
+        os.utime(entry_path, (time_now, time_now))
+        return entry
+
+
+    def save(self, key, entry):
+        if not os.path.exists(self.registry_dir):
+            os.makedirs(self.registry_dir)
+        entry_path = self.__get_entry_path(key)
+        temp_path = entry_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, entry_path)
+        self.evict()
+
+
+    def evict(self):
+        if not os.path.isdir(self.registry_dir):
+            return
+        entries = []
+        for file_name in os.listdir(self.registry_dir):
+            if file_name.endswith(".pkl"):
+                stat = os.stat(os.path.join(self.registry_dir, file_name))
+                entries.append((stat.st_mtime, stat.st_size, file_name))
+        entries.sort()
+
+        # Removes least recently used entries first
+        total_bytes = sum([size for mtime, size, file_name in entries])
+        n_entries = len(entries)
+        for mtime, size, file_name in entries:
+            is_over_bytes = self.max_bytes is not None \
+                            and total_bytes > self.max_bytes
+            is_over_entries = self.max_entries is not None \
+                              and n_entries > self.max_entries
+            if not is_over_bytes and not is_over_entries:
+                break
+            os.remove(os.path.join(self.registry_dir, file_name))
+            total_bytes = total_bytes - size
+            n_entries = n_entries - 1
+
+
+    def __get_entry_path(self, key):
+        return os.path.join(self.registry_dir, key + ".pkl")
@@ -0,0 +1,115 @@
+"""
+`PipelineManifest` class records every raw and processed file of
+the data pipeline in a single SQLite table, replacing per-season
+status files.  Each record holds the content hash of the file, the
+hash of the inputs it was produced from, and the version of the
+stage that produced it, so a stage only recomputes the dates whose
+inputs (or stage version) changed.
+
+Attributes:
+    get_stage(stage, key_prefix): Returns all records of a stage,
+        optionally limited to keys starting with `key_prefix`
+        (e.g., a season), as a dict keyed by record key.
+
+    record(stage, key, content_hash, input_hash, stage_version):
+        Inserts or replaces a record.  Records are committed in
+        batches and by `commit()`.
+
+    get_stale_keys(stage, key_inputs, stage_version, output_paths):
+        Returns the keys whose input hash or stage version differ
+        from the recorded ones, or whose output file is missing.
+
+    hash_file(file_path), hash_bytes(data): Content hashes.
+
+    Requirements:
+        Python standard library (sqlite3, hashlib)
+"""
+
+import os
+import hashlib
+import sqlite3
+import datetime
+import threading
+
+
+class PipelineManifest:
+    def __init__(self, db_path, commit_every = 500):
+        self.db_path = db_path
+        self.commit_every = commit_every
+        self.n_uncommitted = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS manifest (" \
+                                "stage TEXT NOT NULL, " \
+                                "key TEXT NOT NULL, " \
+                                "content_hash TEXT, " \
+                                "input_hash TEXT, " \
+                                "stage_version INTEGER, " \
+                                "updated_at TEXT, " \
+                                "PRIMARY KEY (stage, key))")
+        self.connection.commit()
+
+
+    def get(self, stage, key):
+        return self.get_stage(stage, key).get(key)
+
+
+    def get_stage(self, stage, key_prefix = ""):
+        with self.lock:
+            rows = self.connection.execute("SELECT key, content_hash, " \
+                                           "input_hash, stage_version " \
+                                           "FROM manifest WHERE stage = ? " \
+                                           "AND substr(key, 1, ?) = ?", \
+                                           (stage, len(key_prefix), \
+                                            key_prefix)).fetchall()
+        return {row[0]: {"content_hash": row[1], \
+                         "input_hash": row[2], \
+                         "stage_version": row[3]} for row in rows}
+
+
+    def record(self, stage, key, content_hash = None, input_hash = None, \
+               stage_version = 0):
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO manifest " \
+                                    "VALUES (?, ?, ?, ?, ?, ?)", \
+                                    (stage, key, content_hash, input_hash, \
+                                     stage_version, \
+                                     datetime.datetime.now().isoformat()))
+            self.n_uncommitted = self.n_uncommitted + 1
+            if self.n_uncommitted >= self.commit_every:
+                self.connection.commit()
+                self.n_uncommitted = 0
+
+
+    def commit(self):
+        with self.lock:
+            self.connection.commit()
+            self.n_uncommitted = 0
+
+
+    def get_stale_keys(self, stage, key_inputs, stage_version, \
+                       output_paths = None, key_prefix = ""):
+        records = self.get_stage(stage, key_prefix)
+        stale_keys = []
+        for key, input_hash in key_inputs.items():
+            rec = records.get(key)
+            if rec is None \
+               or rec["input_hash"] != input_hash \
+               or rec["stage_version"] != stage_version \
+               or (output_paths is not None \
+                   and not os.path.exists(output_paths[key])):
+                stale_keys.append(key)
+        return stale_keys
+
+
+    @staticmethod
+    def hash_bytes(data):
+        return hashlib.sha1(data).hexdigest()
+
+
+    @staticmethod
+    def hash_file(file_path):
+        if not os.path.isfile(file_path):
+            return None
+        with open(file_path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
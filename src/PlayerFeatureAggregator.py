@@ -0,0 +1,180 @@
+"""
+`PlayerFeatureAggregator` class aggregates daily player box scores
+into team-game features, keyed by `team` and `game_date` like the
+processed team box scores.
+
+Player files are streamed one day at a time.  Only the current
+season's per-player and per-team state is kept (team, games,
+seconds played and last game played for the team), so memory does
+not grow with the number of seasons processed.
+
+Attributes:
+    update(player_df, game_date): Returns the team-game features of
+        one day of player box scores and adds the day to the state.
+        Days must be passed in date order.
+
+    save_state(state_path), load_state(state_path): Persists the
+        per-player state and the last date processed (`date_last`)
+        for incremental daily updates.
+
+    Features:
+        n_players: players with playing time
+        top<N>_minutes_share: share of team minutes played by the
+            `n_top` players with the most minutes
+        starters_usage_share: share of team usage (FGA + 0.44 FTA +
+            TOV) of starters, taken as the `n_starters` players with
+            the most minutes
+        bench_points, bench_points_share: points scored by the other
+            players
+        missing_regulars, missing_regular_minutes: number and season
+            average minutes of the team's regulars (at least
+            `min_games` games and `regular_minutes` minutes per game,
+            playing in one of the team's last `recent_games` games)
+            without playing time
+
+    Requirements:
+        pandas, numpy
+"""
+
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+
+class PlayerFeatureAggregator:
+    def __init__(self, n_top = 3, n_starters = 5, regular_minutes = 20, \
+                 min_games = 5, recent_games = 5):
+        self.params = {"n_top": n_top, "n_starters": n_starters, \
+                       "regular_minutes": regular_minutes, \
+                       "min_games": min_games, "recent_games": recent_games}
+        self.n_top = n_top
+        self.n_starters = n_starters
+        self.regular_seconds = regular_minutes*60
+        self.min_games = min_games
+        self.recent_games = recent_games
+        self.feats = ["n_players", "top" + str(n_top) + "_minutes_share", \
+                      "starters_usage_share", "bench_points", \
+                      "bench_points_share", "missing_regulars", \
+                      "missing_regular_minutes"]
+        self.season = None
+        self.players = {}
+        self.teams = {}
+        self.date_last = None
+
+
+    def update(self, player_df, game_date):
+        game_date = pd.Timestamp(game_date)
+        season = game_date.year if game_date.month >= 7 else game_date.year - 1
+        if season != self.season:
+            # Keeps only the current season's state
+            self.season = season
+            self.players = {}
+            self.teams = {}
+
+        player_df = player_df.loc[player_df["seconds_played"] > 0]
+        team_idx, teams = pd.factorize(player_df["team"])
+        n_teams = len(teams)
+        seconds = player_df["seconds_played"].to_numpy(dtype=float)
+        points = (player_df["made_free_throws"] \
+                  + 2*player_df["made_field_goals"] \
+                  + player_df["made_three_point_field_goals"]).to_numpy(dtype=float)
+        usage = (player_df["attempted_field_goals"] \
+                 + 0.44*player_df["attempted_free_throws"] \
+                 + player_df["turnovers"]).to_numpy(dtype=float)
+
+        # Ranks players of each team by minutes played
+        order = np.lexsort((-seconds, team_idx))
+        group_start = np.searchsorted(team_idx[order], np.arange(n_teams))
+        rank = np.empty(len(order), dtype=int)
+        rank[order] = np.arange(len(order)) - group_start[team_idx[order]]
+        is_top = rank < self.n_top
+        is_starter = rank < self.n_starters
+
+        def team_sum(values):
+            return np.bincount(team_idx, weights=values, minlength=n_teams)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bench_points = team_sum(points*~is_starter)
+            features = {"team": teams, \
+                        "game_date": game_date, \
+                        "n_players": np.bincount(team_idx, minlength=n_teams), \
+                        self.feats[1]: team_sum(seconds*is_top)/team_sum(seconds), \
+                        "starters_usage_share": team_sum(usage*is_starter) \
+                                                / team_sum(usage), \
+                        "bench_points": bench_points, \
+                        "bench_points_share": bench_points/team_sum(points)}
+
+        # Regulars are found before today's games are added
+        slugs = player_df["slug"].to_numpy()
+        missing = [self.__get_missing_regulars(team, set(slugs[team_idx == idx])) \
+                   for idx, team in enumerate(teams)]
+        features["missing_regulars"] = [n_missing for n_missing, minutes \
+                                        in missing]
+        features["missing_regular_minutes"] = [minutes for n_missing, minutes \
+                                               in missing]
+        features_df = pd.DataFrame(features)
+
+        self.__add_day(player_df)
+        if self.date_last is None or game_date > self.date_last:
+            self.date_last = game_date
+        return features_df
+
+
+    def save_state(self, state_path):
+        temp_path = state_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump({"params": self.params, "season": self.season, \
+                         "players": self.players, "teams": self.teams, \
+                         "date_last": self.date_last}, \
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, state_path)
+
+
+    def load_state(self, state_path):
+        with open(state_path, "rb") as f:
+            saved_state = pickle.load(f)
+        if saved_state["params"] != self.params:
+            raise ValueError("Saved state was computed with other parameters")
+        self.season = saved_state["season"]
+        self.players = saved_state["players"]
+        self.teams = saved_state["teams"]
+        self.date_last = saved_state["date_last"]
+
+
+    def __get_missing_regulars(self, team, played_slugs):
+        if team not in self.teams:
+            return 0, 0.0
+        team_state = self.teams[team]
+        n_missing = 0
+        minutes = 0.0
+        for slug in sorted(team_state["players"] - played_slugs):
+            games, seconds, last_team_game = self.players[slug][1:]
+            if games >= self.min_games \
+               and seconds >= self.regular_seconds*games \
+               and team_state["n_games"] - last_team_game < self.recent_games:
+                n_missing += 1
+                minutes += seconds/games/60
+        return n_missing, minutes
+
+
+    def __add_day(self, player_df):
+        for team in pd.unique(player_df["team"]):
+            if team not in self.teams:
+                self.teams[team] = {"n_games": 0, "players": set()}
+            self.teams[team]["n_games"] += 1
+
+        # Player state is [team, games, seconds, team game last played],
+        # reset when the player moves to another team
+        for slug, team, seconds in zip(player_df["slug"], player_df["team"], \
+                                       player_df["seconds_played"]):
+            player_state = self.players.get(slug)
+            if player_state is None or player_state[0] != team:
+                if player_state is not None:
+                    self.teams[player_state[0]]["players"].discard(slug)
+                player_state = [team, 0, 0, 0]
+                self.players[slug] = player_state
+                self.teams[team]["players"].add(slug)
+            player_state[1] += 1
+            player_state[2] += int(seconds)
+            player_state[3] = self.teams[team]["n_games"]
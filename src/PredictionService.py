@@ -0,0 +1,260 @@
+"""
+`PredictionService` class serves win probabilities from a fitted
+model saved with `DataClassifier.save_model`.  The model is loaded
+once; concurrent requests are collected into micro-batches and
+scored with one vectorized `predict_proba` call per batch.
+
+Attributes:
+    predict(rows): Returns win probabilities for a list of games,
+        each either a dict keyed by feature name or a list of
+        feature values in model feature order.  Goes through the
+        same micro-batching as HTTP requests.  Non-finite features
+        raise ValueError (400 over HTTP) before being queued.  When a
+        batch fails, its requests are scored one by one, so only the
+        failing requests get the error.
+
+    start(): Starts the batching thread and a local HTTP server
+        (`POST /predict` with `{"games": [...]}`, `GET /stats`).
+        Returns the server address.
+
+    stop(): Stops the HTTP server and batching thread.
+
+    get_latency_stats(): Returns request count and p50/p99 latency
+        in milliseconds.
+
+`PredictionClient` class is a small HTTP client for the service.
+
+    Requirements:
+        numpy, model requirements (e.g., sklearn)
+"""
+
+import json
+import time
+import queue
+import pickle
+import threading
+import urllib.request
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+
+
+class PredictionService:
+    def __init__(self, model_path, host = "127.0.0.1", port = 8000, \
+                 max_batch_size = 1024, max_wait_ms = 2.0):
+        with open(model_path, "rb") as f:
+            model_entry = pickle.load(f)
+        self.model = model_entry["model"]
+        self.feats = model_entry["feats"]
+        self.name = model_entry["name"]
+        self.idx_win = list(self.model.classes_).index(1)
+
+        self.host = host
+        self.port = port
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.request_queue = queue.Queue()
+        self.latencies = deque(maxlen=100000)
+        self.latency_lock = threading.Lock()
+        self.batch_thread = None
+        self.server = None
+        self.server_thread = None
+
+
+    def predict(self, rows):
+        time_start = time.perf_counter()
+        if self.batch_thread is None:
+            self.__start_batching()
+
+        # Queues request and waits for its batch to be scored
+        request = {"rows": self.__get_feature_rows(rows), \
+                   "done": threading.Event(), \
+                   "result": None, \
+                   "error": None}
+        self.request_queue.put(request)
+        request["done"].wait()
+        if request["error"] is not None:
+            raise request["error"]
+
+        with self.latency_lock:
+            self.latencies.append((time.perf_counter() - time_start)*1000)
+        return request["result"].tolist()
+
+
+    def start(self):
+        self.__start_batching()
+        service = self
+
+        class PredictionHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != "/predict":
+                    self.send_error(404)
+                    return
+                try:
+                    n_bytes = int(self.headers.get("Content-Length", 0))
+                    body = json.loads(self.rfile.read(n_bytes))
+                    probabilities = service.predict(body["games"])
+                except (ValueError, KeyError, TypeError) as error:
+                    self.__send_json(400, {"error": str(error)})
+                    return
+                except Exception as error:
+                    self.__send_json(500, {"error": str(error)})
+                    return
+                self.__send_json(200, {"win_probability": probabilities})
+
+            def do_GET(self):
+                if self.path != "/stats":
+                    self.send_error(404)
+                    return
+                self.__send_json(200, service.get_latency_stats())
+
+            def __send_json(self, status, response):
+                data = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), \
+                                          PredictionHandler)
+        self.server.daemon_threads = True
+        self.server_thread = threading.Thread(target=self.server.serve_forever, \
+                                              daemon=True)
+        self.server_thread.start()
+        return self.server.server_address
+
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.batch_thread is not None:
+            self.request_queue.put(None)
+            self.batch_thread.join()
+            self.batch_thread = None
+
+
+    def get_latency_stats(self):
+        with self.latency_lock:
+            latencies = np.array(self.latencies)
+        if latencies.shape[0] == 0:
+            return {"count": 0, "p50_ms": None, "p99_ms": None}
+        return {"count": int(latencies.shape[0]), \
+                "p50_ms": float(np.percentile(latencies, 50)), \
+                "p99_ms": float(np.percentile(latencies, 99))}
+
+
+    def __get_feature_rows(self, rows):
+        if len(rows) > 0 and isinstance(rows[0], dict):
+            rows = [[row[feat] for feat in self.feats] for row in rows]
+        X = np.asarray(rows, dtype=np.float32).reshape(-1, len(self.feats))
+        if not np.isfinite(X).all():
+            raise ValueError("Features must be finite numbers.")
+        return X
+
+
+    def __start_batching(self):
+        if self.batch_thread is None:
+            self.batch_thread = threading.Thread(target=self.__run_batches, \
+                                                 daemon=True)
+            self.batch_thread.start()
+
+
+    def __run_batches(self):
+        while True:
+            request = self.request_queue.get()
+            if request is None:
+                return
+
+            # Collects requests until the batch is full or the wait is over
+            batch = [request]
+            n_rows = request["rows"].shape[0]
+            time_end = time.perf_counter() + self.max_wait_ms/1000
+            while n_rows < self.max_batch_size:
+                wait_time = time_end - time.perf_counter()
+                if wait_time <= 0:
+                    break
+                try:
+                    request = self.request_queue.get(timeout=wait_time)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.request_queue.put(None)
+                    break
+                batch.append(request)
+                n_rows = n_rows + request["rows"].shape[0]
+
+            # Scores the whole batch at once
+            try:
+                X = np.vstack([request["rows"] for request in batch])
+                probabilities = self.model.predict_proba(X)[:, self.idx_win]
+                row_start = 0
+                for request in batch:
+                    row_end = row_start + request["rows"].shape[0]
+                    request["result"] = probabilities[row_start:row_end]
+                    row_start = row_end
+            except Exception as error:
+                # Scores requests one by one, so only failing requests
+                # get an error
+                for request in batch:
+                    if len(batch) == 1:
+                        request["error"] = error
+                        continue
+                    try:
+                        request["result"] = self.model.predict_proba(\
+                            request["rows"])[:, self.idx_win]
+                    except Exception as request_error:
+                        request["error"] = request_error
+            for request in batch:
+                request["done"].set()
+
+
+class PredictionClient:
+    def __init__(self, host = "127.0.0.1", port = 8000):
+        self.url = "http://" + host + ":" + str(port)
+
+
+    def predict(self, games):
+        data = json.dumps({"games": games}).encode()
+        request = urllib.request.Request(self.url + "/predict", data=data, \
+                                         headers={"Content-Type": \
+                                                  "application/json"})
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())["win_probability"]
+
+
+    def get_latency_stats(self):
+        with urllib.request.urlopen(self.url + "/stats") as response:
+            return json.loads(response.read())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serves win probabilities " \
+                                     "from a model saved with " \
+                                     "DataClassifier.save_model.")
+    parser.add_argument("model_path")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=1024)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    service = PredictionService(args.model_path, host=args.host, \
+                                port=args.port, \
+                                max_batch_size=args.max_batch_size, \
+                                max_wait_ms=args.max_wait_ms)
+    address = service.start()
+    print("Serving " + service.name + " on http://" + address[0] + ":" \
+          + str(address[1]))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        service.stop()
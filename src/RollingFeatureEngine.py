@@ -0,0 +1,336 @@
+"""
+`RollingFeatureEngine` class computes pre-game features of each team
+from its previous games only, so they are available before tip-off:
+last-N-game averages, season-to-date averages, season-to-date home
+and away averages, games played and rest days.
+
+The full history is computed in one vectorized grouped pass.  The
+engine then keeps a compact state per team (running sums and counts
+and a ring buffer of the last N games) and updates it in constant
+time per new game as daily files arrive.
+
+Attributes:
+    compute(team_df): Returns pre-game features for every row of
+        `team_df` (e.g., `complete_processed_team_box`), in row
+        order, and sets the per-team state from the full history.
+
+    get_features(games_df): Returns pre-game features for upcoming
+        games (columns `team`, `game_date`, `location`) from the
+        current state, without changing it.
+
+    update(team_df): Returns pre-game features for new games (in date
+        order, after the games already in the state) and adds the
+        games to the state.
+
+    update_from_daily_files(proc_team_file_path): Updates the state
+        with processed daily team box score files newer than the last
+        game in the state.  Returns the features of the new games.
+
+    save_state(state_path), load_state(state_path): Persists the
+        per-team state.
+
+    Features are named `<stat>_last<N>`, `<stat>_season`,
+    `<stat>_home`, `<stat>_away`, `games_played` and `rest_days`
+    (NaN for the first game of a season).  `win` (1 for win) is
+    derived from `outcome` when listed in `stats`.
+
+    Requirements:
+        pandas, numpy
+"""
+
+import os
+import pickle
+import datetime
+import numpy as np
+import pandas as pd
+
+
+class RollingFeatureEngine:
+    def __init__(self, stats = ["win", "game_score", "opponent_score", \
+                                "field_goal_percentage", \
+                                "three_point_percentage", \
+                                "made_free_throws", "total_rebounds", \
+                                "turnovers", "personal_fouls"], \
+                 windows = [5, 10]):
+        self.stats = list(stats)
+        self.windows = sorted(windows)
+        self.max_window = self.windows[-1]
+        self.feats = [stat + "_last" + str(n_games) for n_games in self.windows \
+                      for stat in self.stats] \
+                     + [stat + "_" + split for split in ["season", "home", "away"] \
+                        for stat in self.stats] \
+                     + ["games_played", "rest_days"]
+        self.state = {}
+        self.date_last = None
+
+
+    def compute(self, team_df):
+        # Sorts games by team and date, keeping the original row order
+        values, team_df = self.__get_stat_values(team_df)
+        order = team_df.reset_index(drop=True) \
+                       .sort_values(["team", "game_date"], kind="mergesort") \
+                       .index.to_numpy()
+        sorted_df = team_df.iloc[order].reset_index(drop=True)
+        values = values[order]
+        is_valid = ~np.isnan(values)
+        values = np.where(is_valid, values, 0.0)
+        season = self.__get_season(sorted_df["game_date"])
+        location = sorted_df["location"].to_numpy()
+
+        team_idx = pd.factorize(sorted_df["team"])[0]
+        season_idx = pd.factorize(sorted_df["team"].astype(str) + "/" \
+                                  + season.astype(str))[0]
+        features = {}
+
+        # Sums and counts of previous games of the team
+        team_sums = self.__get_prior_sums(values, team_idx)
+        team_counts = self.__get_prior_sums(is_valid.astype(float), team_idx)
+        game_idx = pd.Series(team_idx).groupby(team_idx).cumcount().to_numpy()
+        for n_games in self.windows:
+            has_window = game_idx >= n_games
+            idx_window = np.where(has_window, np.arange(len(game_idx)) - n_games, 0)
+            window_sums = team_sums - np.where(has_window[:, None], \
+                                               team_sums[idx_window], 0.0)
+            window_counts = team_counts - np.where(has_window[:, None], \
+                                                   team_counts[idx_window], 0.0)
+            self.__add_means(features, "_last" + str(n_games), window_sums, \
+                             window_counts)
+
+        # Season-to-date, overall and by location
+        for split, mask in [("season", np.ones(len(location), dtype=bool)), \
+                            ("home", location == "home"), \
+                            ("away", location == "away")]:
+            split_sums = self.__get_prior_sums(values*mask[:, None], season_idx)
+            split_counts = self.__get_prior_sums((is_valid*mask[:, None]) \
+                                                 .astype(float), season_idx)
+            self.__add_means(features, "_" + split, split_sums, split_counts)
+
+        features["games_played"] = pd.Series(season_idx).groupby(season_idx) \
+                                     .cumcount().to_numpy()
+        game_date = sorted_df["game_date"].to_numpy()
+        rest_days = np.full(len(game_date), np.nan)
+        is_same_season = np.zeros(len(game_date), dtype=bool)
+        is_same_season[1:] = season_idx[1:] == season_idx[:-1]
+        rest_days[is_same_season] = (game_date[1:] - game_date[:-1]) \
+            [is_same_season[1:]] / np.timedelta64(1, "D")
+        features["rest_days"] = rest_days
+
+        # Restores row order of the input
+        features_df = pd.DataFrame(features, columns=self.feats)
+        features_df.index = order
+        features_df = features_df.sort_index()
+        features_df.index = team_df.index
+
+        self.__set_state(sorted_df, values, is_valid, season, team_idx)
+        return features_df
+
+
+    def get_features(self, games_df):
+        rows = []
+        for team, game_date, location in zip(games_df["team"], \
+                                             pd.to_datetime(games_df["game_date"]), \
+                                             games_df["location"]):
+            rows.append(self.__get_team_features(team, game_date, location))
+        return pd.DataFrame(rows, columns=self.feats, index=games_df.index)
+
+
+    def update(self, team_df):
+        values, team_df = self.__get_stat_values(team_df)
+        is_valid = ~np.isnan(values)
+        values = np.where(is_valid, values, 0.0)
+        rows = []
+        for idx, (team, game_date, location) in enumerate(zip(\
+                team_df["team"], pd.to_datetime(team_df["game_date"]), \
+                team_df["location"])):
+            rows.append(self.__get_team_features(team, game_date, location))
+            self.__add_game(team, game_date, location, values[idx], is_valid[idx])
+            if self.date_last is None or game_date > self.date_last:
+                self.date_last = game_date
+        return pd.DataFrame(rows, columns=self.feats, index=team_df.index)
+
+
+    def update_from_daily_files(self, proc_team_file_path):
+        # Reads only daily files after the last game in the state
+        file_paths = []
+        for season_str in sorted(os.listdir(proc_team_file_path)):
+            season_dir_path = os.path.join(proc_team_file_path, season_str)
+            if not os.path.isdir(season_dir_path) or "=" in season_str:
+                continue
+            for file_name in sorted(os.listdir(season_dir_path)):
+                if not file_name.endswith("_team_box_scores.csv"):
+                    continue
+                file_date = pd.Timestamp(datetime.date(int(file_name[0:4]), \
+                                                       int(file_name[5:7]), \
+                                                       int(file_name[8:10])))
+                if self.date_last is None or file_date > self.date_last:
+                    file_paths.append(os.path.join(season_dir_path, file_name))
+        if not file_paths:
+            return pd.DataFrame(columns=self.feats)
+        team_df = pd.concat([pd.read_csv(file_path, parse_dates=["game_date"]) \
+                             for file_path in file_paths], ignore_index=True)
+        return pd.concat([team_df.loc[:, ["team", "game_date", "location"]], \
+                          self.update(team_df)], axis=1)
+
+
+    def save_state(self, state_path):
+        temp_path = state_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump({"stats": self.stats, "windows": self.windows, \
+                         "state": self.state, "date_last": self.date_last}, \
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, state_path)
+
+
+    def load_state(self, state_path):
+        with open(state_path, "rb") as f:
+            saved_state = pickle.load(f)
+        if saved_state["stats"] != self.stats \
+           or saved_state["windows"] != self.windows:
+            raise ValueError("Saved state was computed for other stats or windows")
+        self.state = saved_state["state"]
+        self.date_last = saved_state["date_last"]
+
+
+    def __get_stat_values(self, team_df):
+        if "win" in self.stats and "win" not in team_df.columns:
+            if team_df["outcome"].dtype.kind in "biu":
+                team_df = team_df.assign(win=team_df["outcome"].astype(float))
+            else:
+                team_df = team_df.assign(win=team_df["outcome"].eq("win") \
+                                                               .astype(float))
+        team_df = team_df.assign(game_date=pd.to_datetime(team_df["game_date"]))
+        values = team_df.loc[:, self.stats].to_numpy(dtype=np.float64)
+        return values, team_df
+
+
+    def __get_season(self, game_date):
+        # Seasons are labeled by their start year
+        return np.where(game_date.dt.month >= 7, game_date.dt.year, \
+                        game_date.dt.year - 1)
+
+
+    def __get_prior_sums(self, values, group_idx):
+        # Group cumulative sums before each row (rows sorted by group)
+        sums = pd.DataFrame(values).groupby(group_idx).cumsum().to_numpy()
+        return sums - values
+
+
+    def __add_means(self, features, suffix, sums, counts):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, sums/counts, np.nan)
+        for idx_stat, stat in enumerate(self.stats):
+            features[stat + suffix] = means[:, idx_stat]
+
+
+    def __new_team_state(self):
+        n_stats = len(self.stats)
+        return {"recent": np.zeros((self.max_window, n_stats)), \
+                "recent_valid": np.zeros((self.max_window, n_stats)), \
+                "n_games": 0, \
+                "window_sums": np.zeros((len(self.windows), n_stats)), \
+                "window_counts": np.zeros((len(self.windows), n_stats)), \
+                "season": None, \
+                "date_last": None, \
+                "season_games": 0, \
+                "split_sums": {split: np.zeros(n_stats) \
+                               for split in ["season", "home", "away"]}, \
+                "split_counts": {split: np.zeros(n_stats) \
+                                 for split in ["season", "home", "away"]}}
+
+
+    def __set_state(self, sorted_df, values, is_valid, season, team_idx):
+        # Builds per-team state from the last games of each team
+        self.state = {}
+        location = sorted_df["location"].to_numpy()
+        game_date = sorted_df["game_date"]
+        group_ends = np.flatnonzero(np.r_[team_idx[1:] != team_idx[:-1], True])
+        group_starts = np.r_[0, group_ends[:-1] + 1]
+        for idx_start, idx_end in zip(group_starts, group_ends):
+            team_state = self.__new_team_state()
+            idx_recent = max(idx_start, idx_end + 1 - self.max_window)
+            for idx in range(idx_recent, idx_end + 1):
+                self.__push_recent(team_state, values[idx], is_valid[idx])
+
+            # Season-to-date sums of the team's current season
+            idx_season = np.arange(idx_start, idx_end + 1)
+            idx_season = idx_season[season[idx_season] == season[idx_end]]
+            team_state["season"] = season[idx_end]
+            team_state["season_games"] = len(idx_season)
+            team_state["date_last"] = game_date.iloc[idx_end]
+            for split in ["season", "home", "away"]:
+                idx_split = idx_season if split == "season" \
+                            else idx_season[location[idx_season] == split]
+                team_state["split_sums"][split] = values[idx_split].sum(axis=0)
+                team_state["split_counts"][split] = is_valid[idx_split] \
+                                                      .sum(axis=0).astype(float)
+            self.state[sorted_df["team"].iloc[idx_end]] = team_state
+        if sorted_df.shape[0] > 0:
+            self.date_last = sorted_df["game_date"].max()
+
+
+    def __push_recent(self, team_state, value, is_valid):
+        # Ring buffer of the last games with running window sums
+        n_recent = team_state["n_games"]
+        for idx_window, n_games in enumerate(self.windows):
+            if n_recent >= n_games:
+                idx_old = (n_recent - n_games) % self.max_window
+                team_state["window_sums"][idx_window] -= team_state["recent"][idx_old]
+                team_state["window_counts"][idx_window] \
+                    -= team_state["recent_valid"][idx_old]
+            team_state["window_sums"][idx_window] += value
+            team_state["window_counts"][idx_window] += is_valid
+        idx_new = n_recent % self.max_window
+        team_state["recent"][idx_new] = value
+        team_state["recent_valid"][idx_new] = is_valid
+        team_state["n_games"] = n_recent + 1
+
+
+    def __add_game(self, team, game_date, location, value, is_valid):
+        team_state = self.state.setdefault(team, self.__new_team_state())
+        season = game_date.year if game_date.month >= 7 else game_date.year - 1
+        if team_state["season"] != season:
+            team_state["season"] = season
+            team_state["season_games"] = 0
+            for split in ["season", "home", "away"]:
+                team_state["split_sums"][split] = np.zeros(len(self.stats))
+                team_state["split_counts"][split] = np.zeros(len(self.stats))
+        self.__push_recent(team_state, value, is_valid)
+        for split in ["season", location]:
+            if split in team_state["split_sums"]:
+                team_state["split_sums"][split] = team_state["split_sums"][split] \
+                                                  + value
+                team_state["split_counts"][split] \
+                    = team_state["split_counts"][split] + is_valid
+        team_state["season_games"] = team_state["season_games"] + 1
+        team_state["date_last"] = game_date
+
+
+    def __get_team_features(self, team, game_date, location):
+        team_state = self.state.get(team)
+        if team_state is None:
+            team_state = self.__new_team_state()
+        features = []
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for idx_window in range(len(self.windows)):
+                counts = team_state["window_counts"][idx_window]
+                features.extend(np.where(counts > 0, \
+                                         team_state["window_sums"][idx_window] \
+                                         / counts, np.nan))
+
+            # Season-to-date values restart in a new season
+            season = game_date.year if game_date.month >= 7 else game_date.year - 1
+            is_same_season = team_state["season"] == season
+            for split in ["season", "home", "away"]:
+                counts = team_state["split_counts"][split]
+                if is_same_season:
+                    features.extend(np.where(counts > 0, \
+                                             team_state["split_sums"][split] \
+                                             / counts, np.nan))
+                else:
+                    features.extend([np.nan]*len(self.stats))
+        if is_same_season:
+            features.append(team_state["season_games"])
+            features.append((game_date - team_state["date_last"]).days)
+        else:
+            features.extend([0, np.nan])
+        return features
@@ -0,0 +1,116 @@
+"""
+`ScrapeCache` class keeps the responses of scrape requests on disk,
+gzip-compressed and keyed by endpoint and date or season, so that
+resumes and rebuilds are served locally instead of requesting
+basketball-reference again.
+
+Every response is recorded with the time it was fetched and whether
+it is final, i.e., fetched after the date from which its content can
+no longer change (e.g., a few days after the games of a day, leaving
+time for stat corrections).  Final responses are always served from
+the cache; others only until they are `max_age` old.
+
+Attributes:
+    load(endpoint, key, output_file_path): Writes the cached response
+        to `output_file_path` and returns True if it is fresh,
+        otherwise returns False.
+
+    save(endpoint, key, file_path, final_date): Stores the response
+        saved at `file_path` (including responses without games) and
+        returns whether it is final.
+
+    is_final(endpoint, key): Returns whether the cached response can
+        no longer change.
+
+    Responses are stored as `<cache_dir>/<endpoint>/<key>.csv.gz`,
+    indexed in `<cache_dir>/scrape_cache.db`.
+
+    Requirements:
+        Python standard library (sqlite3, gzip)
+"""
+
+import os
+import gzip
+import sqlite3
+import datetime
+import threading
+
+
+class ScrapeCache:
+    def __init__(self, cache_dir, max_age = datetime.timedelta(hours=1)):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(os.path.join(cache_dir, \
+                                                       "scrape_cache.db"), \
+                                          check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS responses (" \
+                                "endpoint TEXT NOT NULL, " \
+                                "key TEXT NOT NULL, " \
+                                "fetched_at TEXT, " \
+                                "is_final INTEGER, " \
+                                "PRIMARY KEY (endpoint, key))")
+        self.connection.commit()
+
+
+    def get(self, endpoint, key):
+        with self.lock:
+            row = self.connection.execute("SELECT fetched_at, is_final " \
+                                          "FROM responses WHERE endpoint = ? " \
+                                          "AND key = ?", \
+                                          (endpoint, key)).fetchone()
+        if row is None:
+            return None
+        return {"fetched_at": datetime.datetime.fromisoformat(row[0]), \
+                "is_final": bool(row[1])}
+
+
+    def is_final(self, endpoint, key):
+        entry = self.get(endpoint, key)
+        return entry is not None and entry["is_final"]
+
+
+    def load(self, endpoint, key, output_file_path):
+        entry = self.get(endpoint, key)
+        if entry is None:
+            return False
+        if not entry["is_final"] \
+           and datetime.datetime.now() - entry["fetched_at"] >= self.max_age:
+            return False
+        response_path = self.__get_response_path(endpoint, key)
+        if not os.path.isfile(response_path):
+            return False
+        with gzip.open(response_path, "rb") as f:
+            data = f.read()
+        with open(output_file_path, "wb") as f:
+            f.write(data)
+        return True
+
+
+    def save(self, endpoint, key, file_path, final_date):
+        with open(file_path, "rb") as f:
+            data = f.read()
+        response_path = self.__get_response_path(endpoint, key)
+        if not os.path.exists(os.path.dirname(response_path)):
+            os.makedirs(os.path.dirname(response_path), exist_ok=True)
+        temp_path = response_path + ".tmp"
+        with gzip.open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, response_path)
+
+        # Content fetched after `final_date` can no longer change
+        fetched_at = datetime.datetime.now()
+        is_final = fetched_at.date() > final_date
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO responses " \
+                                    "VALUES (?, ?, ?, ?)", \
+                                    (endpoint, key, fetched_at.isoformat(), \
+                                     int(is_final)))
+            self.connection.commit()
+        return is_final
+
+
+    def __get_response_path(self, endpoint, key):
+        return os.path.join(self.cache_dir, endpoint, key + ".csv.gz")
@@ -0,0 +1,103 @@
+"""
+`ScrapeEngine` class runs scrape requests concurrently with a
+bounded pool of worker threads, a token-bucket rate limit, and
+retry with exponential backoff.
+
+Attributes:
+    fetch(endpoint, **kwargs): Waits for a rate limit token, then
+        calls `endpoint` on the scraper client (e.g.,
+        `client.team_box_scores(day=1, month=11, year=2019, ...)`).
+
+    run(items, task): Runs `task(item)` for every item on the worker
+        pool, retrying failed tasks.  Returns the task results in item
+        order and the list of failed items.  Progress is saved by the
+        tasks themselves (e.g., one manifest record per day), and
+        failed items are logged by `instrumentation`.
+
+`TokenBucket` class limits the request rate shared by all workers.
+
+    Requirements:
+        Scraper client with the interface of
+            https://github.com/jaebradley/basketball_reference_web_scraper
+        A local fake client with the same methods can be passed in
+        to run the engine offline.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .StageInstrumentation import StageInstrumentation
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.time_last = time.monotonic()
+        self.lock = threading.Lock()
+
+
+    def acquire(self):
+        if self.rate is None:
+            return
+        while True:
+            with self.lock:
+                time_now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens \
+                                  + (time_now - self.time_last)*self.rate)
+                self.time_last = time_now
+                if self.tokens >= 1:
+                    self.tokens = self.tokens - 1
+                    return
+                wait_time = (1 - self.tokens)/self.rate
+            time.sleep(wait_time)
+
+
+class ScrapeEngine:
+    def __init__(self, client, n_workers = 8, requests_per_second = 1.0, \
+                 burst = 4, max_retries = 3, backoff_seconds = 2.0, \
+                 instrumentation = None):
+        self.client = client
+        self.n_workers = n_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.token_bucket = TokenBucket(requests_per_second, burst)
+        if instrumentation is None:
+            instrumentation = StageInstrumentation()
+        self.instrumentation = instrumentation
+
+
+    def fetch(self, endpoint, **kwargs):
+        self.token_bucket.acquire()
+        return getattr(self.client, endpoint)(**kwargs)
+
+
+    def run(self, items, task):
+        items = list(items)
+        results = [None]*len(items)
+        failed_items = []
+        with ThreadPoolExecutor(max_workers=self.n_workers) as executor:
+            futures = {executor.submit(self.__run_with_retry, task, item): idx \
+                       for idx, item in enumerate(items)}
+            for future in as_completed(futures):
+                idx = futures[future]
+                try:
+                    results[idx] = future.result()
+                except Exception as error:
+                    self.instrumentation.log("FAILED TO SCRAPE " \
+                                             + str(items[idx]) + ": " \
+                                             + repr(error), 1)
+                    failed_items.append(items[idx])
+
+        return results, failed_items
+
+
+    def __run_with_retry(self, task, item):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return task(item)
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff_seconds * 2**attempt)
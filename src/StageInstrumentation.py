@@ -0,0 +1,240 @@
+"""
+`StageInstrumentation` class records structured events for the
+stages of `DataProcessor` and `DataClassifier` and replaces their
+per-day print statements.
+
+Each stage is timed with `with instrumentation.stage(name):`, and
+each season within it from `next_season(season)` to the next call.  When it ends, an event
+is recorded with wall and CPU time, files and bytes read/written,
+rows processed and peak memory.  Counts added inside a season are
+also added to its stage.
+
+Attributes:
+    stage(name, season, **fields): Context manager timing a stage.
+        Yields the event dict, to which extra fields can be added.
+
+    next_season(season), end_season(): Ends the current season (if
+        any) of the open stage and starts timing the next one, e.g.,
+        at the top of a loop over seasons.
+
+    count_read(file_path, rows), count_written(file_path, rows):
+        Adds a file read or written (and its rows) to all open
+        stages.  Safe to call from worker threads.
+
+    count_rows(rows): Adds processed rows to all open stages.
+
+    add_counts(**counts): Adds counts (e.g., `files_read`,
+        `bytes_read`) measured elsewhere, such as in worker processes.
+
+    emit(event, **fields): Records a custom event (e.g.,
+        per-classifier fit/predict time).
+
+    log(message, level): Prints a message if `verbosity` >= `level`.
+
+    get_summary(): Returns all events as a DataFrame.
+
+    print_summary(): Prints a table of stage events.
+
+    Verbosity levels:
+        0: silent
+        1: stage headers, failures and stage summaries
+        2: per-season messages and summaries (default)
+        3: per-day messages
+
+    Events are kept in `events` and, with `event_path`, appended to
+    a JSON lines file.  With `trace_memory` peak memory is measured
+    per stage with `tracemalloc` (slower); otherwise the process peak
+    resident memory so far is recorded.
+
+    Requirements:
+        pandas
+"""
+
+import os
+import sys
+import json
+import time
+import datetime
+import threading
+import tracemalloc
+from contextlib import contextmanager
+import pandas as pd
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+_count_fields = ["files_read", "bytes_read", "files_written", \
+                 "bytes_written", "rows"]
+
+
+def get_usage():
+    # Returns CPU seconds of this process and its children, and peak RSS in MB
+    if resource is None:
+        return time.process_time(), None
+    usage_self = resource.getrusage(resource.RUSAGE_SELF)
+    usage_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_time = usage_self.ru_utime + usage_self.ru_stime \
+               + usage_children.ru_utime + usage_children.ru_stime
+    max_rss = max(usage_self.ru_maxrss, usage_children.ru_maxrss)
+    if sys.platform == "darwin":
+        return cpu_time, max_rss/1024**2
+    return cpu_time, max_rss/1024
+
+
+class StageInstrumentation:
+    def __init__(self, verbosity = 2, event_path = None, trace_memory = False):
+        self.verbosity = verbosity
+        self.event_path = event_path
+        self.trace_memory = trace_memory
+        self.events = []
+        self.open_events = []
+        self.lock = threading.Lock()
+
+
+    @contextmanager
+    def stage(self, name, season = None, **fields):
+        event = self.__open(name, season, fields)
+        try:
+            yield event
+        finally:
+            # Closes the last season started with `next_season`
+            if self.open_events[-1] is not event:
+                self.end_season()
+            self.__close(event)
+
+
+    def next_season(self, season):
+        # Ends the previous season of the current stage and starts the next
+        self.end_season()
+        self.__open(self.open_events[-1]["stage"], season, {})
+
+
+    def end_season(self):
+        event = self.open_events[-1]
+        if event["season"] is not None and len(self.open_events) > 1 \
+           and self.open_events[-2]["stage"] == event["stage"]:
+            self.__close(event)
+
+
+    def count_read(self, file_path, rows = 0):
+        self.add_counts(files_read=1, bytes_read=self.__get_size(file_path), \
+                        rows=rows)
+
+
+    def count_written(self, file_path, rows = 0):
+        self.add_counts(files_written=1, \
+                        bytes_written=self.__get_size(file_path), rows=rows)
+
+
+    def count_rows(self, rows):
+        self.add_counts(rows=rows)
+
+
+    def add_counts(self, **counts):
+        # Scrape tasks add counts from worker threads
+        with self.lock:
+            for event in self.open_events:
+                for field, value in counts.items():
+                    event[field] = event[field] + value
+
+
+    def emit(self, event, **fields):
+        record = {"event": event}
+        record.update(fields)
+        self.__record(record)
+
+
+    def log(self, message, level = 2):
+        if self.verbosity >= level:
+            print(message)
+
+
+    def get_summary(self):
+        return pd.DataFrame(self.events)
+
+
+    def print_summary(self):
+        summary_df = self.get_summary()
+        if summary_df.shape[0] == 0:
+            return
+        summary_df = summary_df.loc[(summary_df["event"] == "stage") \
+                                    & summary_df["season"].isna()]
+        summary_df = summary_df.astype({field: int for field in _count_fields})
+        cols = [col for col in ["stage", "wall_s", "cpu_s"] + _count_fields \
+                + ["max_rss_mb", "peak_traced_mb"] if col in summary_df.columns]
+        with pd.option_context("display.width", 160, \
+                               "display.max_columns", None):
+            print(summary_df.loc[:, cols].to_string(index=False))
+
+
+    def __open(self, name, season, fields):
+        event = {"event": "stage", "stage": name, "season": season}
+        event.update(fields)
+        for field in _count_fields:
+            event[field] = 0
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self.__update_traced_peak()
+            tracemalloc.reset_peak()
+        event["time_start"] = time.perf_counter()
+        event["cpu_start"] = get_usage()[0]
+        self.open_events.append(event)
+        return event
+
+
+    def __close(self, event):
+        self.open_events.pop()
+        event["wall_s"] = time.perf_counter() - event.pop("time_start")
+        cpu_end, rss_peak = get_usage()
+        event["cpu_s"] = cpu_end - event.pop("cpu_start")
+        event["max_rss_mb"] = rss_peak
+        if self.trace_memory:
+            # Peak since this stage started, including nested stages
+            event["peak_traced_mb"] = max(event.get("peak_traced_mb", 0), \
+                                          tracemalloc.get_traced_memory()[1]/1024**2)
+            self.__update_traced_peak(event["peak_traced_mb"])
+        self.__record(event)
+        self.log(self.__format_event(event), 1 if event["season"] is None else 2)
+
+
+    def __update_traced_peak(self, peak_traced_mb = None):
+        if not self.open_events:
+            return
+        if peak_traced_mb is None:
+            peak_traced_mb = tracemalloc.get_traced_memory()[1]/1024**2
+        self.open_events[-1]["peak_traced_mb"] = max(\
+            self.open_events[-1].get("peak_traced_mb", 0), peak_traced_mb)
+
+
+    def __get_size(self, file_path):
+        try:
+            return os.path.getsize(file_path)
+        except OSError:
+            return 0
+
+
+    def __record(self, event):
+        event["timestamp"] = datetime.datetime.now().isoformat()
+        self.events.append(event)
+        if self.event_path is not None:
+            with open(self.event_path, "a") as f:
+                f.write(json.dumps(event, default=str) + "\n")
+
+
+    def __format_event(self, event):
+        message = event["stage"]
+        if event["season"] is not None:
+            message = "  " + message + " " + str(event["season"])
+        message = message + ": {:.2f} s wall, {:.2f} s CPU".format(\
+            event["wall_s"], event["cpu_s"])
+        if event["files_read"] or event["files_written"]:
+            message = message + ", " + str(event["files_read"]) + " files read (" \
+                      + "{:.1f} MB)".format(event["bytes_read"]/1024**2) + ", " \
+                      + str(event["files_written"]) + " files written (" \
+                      + "{:.1f} MB)".format(event["bytes_written"]/1024**2)
+        if event["rows"]:
+            message = message + ", " + str(event["rows"]) + " rows"
+        return message
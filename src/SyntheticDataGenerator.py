@@ -0,0 +1,317 @@
+"""
+`SyntheticDataGenerator` class writes synthetic raw data in the
+layout of `data_raw` (team box scores, player box scores and season
+schedules), for testing the pipeline at scales beyond the scraped
+data without network access.
+
+Scores are internally consistent: every team score in the season
+schedule equals the points of its team box score
+(free throws + 2*field goals + three pointers), games never end in a
+tie, and player box scores add up to the team box score of their
+game.  Each team plays `games_per_team` regular season games,
+followed by best-of-seven playoff rounds between the top teams.
+
+Attributes:
+    generate(): Writes all seasons to `root_dir` and returns the
+        number of games written.
+
+    Requirements:
+        pandas, numpy
+"""
+
+import os
+import datetime
+import numpy as np
+import pandas as pd
+
+
+_team_cols = ["team", "minutes_played", "made_field_goals", \
+              "attempted_field_goals", "made_three_point_field_goals", \
+              "attempted_three_point_field_goals", "made_free_throws", \
+              "attempted_free_throws", "offensive_rebounds", \
+              "defensive_rebounds", "assists", "steals", "blocks", \
+              "turnovers", "personal_fouls"]
+
+_count_cols = ["offensive_rebounds", "defensive_rebounds", "assists", \
+               "steals", "blocks", "turnovers", "personal_fouls"]
+
+_count_means = [10, 34, 23, 8, 5, 14, 20]
+
+# Start times (UTC) of evening games in US time zones
+_start_hours = [23.5, 24, 24.5, 25, 25.5, 26.5]
+
+
+class SyntheticDataGenerator:
+    def __init__(self, root_dir = "data_raw", n_teams = 30, start_year = 2000, \
+                 n_seasons = 1, games_per_team = 82, n_playoff_teams = 16, \
+                 players_per_team = 12, write_player_box_scores = True, \
+                 seed = 0):
+        self.player_file_path = root_dir + "/player_box_scores/"
+        self.team_file_path = root_dir + "/team_box_scores/"
+        self.season_file_path = root_dir + "/season_schedule/"
+        self.n_teams = n_teams
+        self.start_year = start_year
+        self.n_seasons = n_seasons
+        self.games_per_team = games_per_team
+        self.n_playoff_teams = min(n_playoff_teams, n_teams)
+        self.players_per_team = players_per_team
+        self.write_player_box_scores = write_player_box_scores
+        self.rng = np.random.default_rng(seed)
+        self.teams = np.array(["SYNTHETIC TEAM " + str(idx_team + 1).zfill(3) \
+                               for idx_team in range(n_teams)])
+
+        # Fixed roster weights give each team its leading players
+        self.player_weights = self.rng.dirichlet(np.full(players_per_team, 2.0), \
+                                                 size=n_teams)
+        for dir_path in [self.player_file_path, self.team_file_path, \
+                         self.season_file_path]:
+            if not os.path.exists(dir_path):
+                os.makedirs(dir_path)
+
+
+    def generate(self):
+        n_games = 0
+        for year in range(self.start_year, self.start_year + self.n_seasons):
+            season_str = str(year) + "_" + str(year + 1)
+            print("Generating synthetic season " + str(year) + "-" + str(year+1))
+
+            games_df = self.__get_regular_season(year)
+            games_df = self.__add_box_scores(games_df)
+            games_df = pd.concat([games_df, self.__get_playoffs(year, games_df)], \
+                                 ignore_index=True)
+            self.__write_season(season_str, games_df)
+            n_games = n_games + games_df.shape[0]
+        return n_games
+
+
+    def __get_regular_season(self, year):
+        # Pairs teams with the most remaining games on each day
+        date_start = datetime.date(year, 10, 25)
+        date_end = datetime.date(year + 1, 4, 12)
+        n_days = (date_end - date_start).days + 1
+        remaining = np.full(self.n_teams, self.games_per_team)
+        game_rows = []
+        for idx_day in range(n_days):
+            n_games_day = int(np.ceil(remaining.sum()/2/(n_days - idx_day)))
+            tie_break = self.rng.random(self.n_teams)
+            order = np.lexsort((tie_break, -remaining))
+            teams_day = order[remaining[order] > 0][:2*n_games_day]
+            teams_day = self.rng.permutation(teams_day)
+            n_pairs = teams_day.shape[0]//2
+            for idx_pair in range(n_pairs):
+                away_idx = teams_day[2*idx_pair]
+                home_idx = teams_day[2*idx_pair + 1]
+                game_rows.append((date_start + datetime.timedelta(days=idx_day), \
+                                  away_idx, home_idx))
+            remaining[teams_day[:2*n_pairs]] -= 1
+        return pd.DataFrame(game_rows, columns=["game_date", "away_idx", "home_idx"])
+
+
+    def __get_playoffs(self, year, games_df):
+        # Best-of-seven rounds between the teams with the most wins
+        wins = np.zeros(self.n_teams, dtype=int)
+        np.add.at(wins, np.where(games_df["away_score"] > games_df["home_score"], \
+                                 games_df["away_idx"], games_df["home_idx"]), 1)
+        n_playoff_teams = 2**int(np.log2(max(self.n_playoff_teams, 1)))
+        seeds = list(np.argsort(-wins, kind="stable")[:n_playoff_teams])
+        date_current = games_df["game_date"].max() + datetime.timedelta(days=6)
+
+        playoff_dfs = []
+        while len(seeds) > 1:
+            series = [[seeds[idx], seeds[-1 - idx], 0, 0] \
+                      for idx in range(len(seeds)//2)]
+            while any([max(s[2], s[3]) < 4 for s in series]):
+                game_rows = []
+                for s in series:
+                    if max(s[2], s[3]) < 4:
+                        # Higher seed is home in games 1, 2, 5 and 7
+                        if (s[2] + s[3]) in [0, 1, 4, 6]:
+                            game_rows.append((date_current, s[1], s[0]))
+                        else:
+                            game_rows.append((date_current, s[0], s[1]))
+                day_df = self.__add_box_scores(pd.DataFrame(game_rows, \
+                    columns=["game_date", "away_idx", "home_idx"]))
+                for s, (idx, row) in zip([s for s in series if max(s[2], s[3]) < 4], \
+                                         day_df.iterrows()):
+                    winner = row["away_idx"] if row["away_score"] > row["home_score"] \
+                             else row["home_idx"]
+                    if winner == s[0]:
+                        s[2] = s[2] + 1
+                    else:
+                        s[3] = s[3] + 1
+                playoff_dfs.append(day_df)
+                date_current = date_current + datetime.timedelta(days=2)
+            seeds = [s[0] if s[2] == 4 else s[1] for s in series]
+            date_current = date_current + datetime.timedelta(days=2)
+
+        if not playoff_dfs:
+            return pd.DataFrame()
+        return pd.concat(playoff_dfs, ignore_index=True)
+
+
+    def __add_box_scores(self, games_df):
+        # Draws one box score per team and game
+        n_games = games_df.shape[0]
+        for side in ["away", "home"]:
+            attempted_three = self.rng.poisson(22, n_games)
+            attempted_two = self.rng.poisson(62, n_games)
+            made_three = self.rng.binomial(attempted_three, 0.35)
+            made_two = self.rng.binomial(attempted_two, 0.49)
+            attempted_ft = self.rng.poisson(24, n_games)
+            made_ft = self.rng.binomial(attempted_ft, 0.76)
+            games_df[side + "_made_field_goals"] = made_two + made_three
+            games_df[side + "_attempted_field_goals"] = attempted_two \
+                                                        + attempted_three
+            games_df[side + "_made_three_point_field_goals"] = made_three
+            games_df[side + "_attempted_three_point_field_goals"] = attempted_three
+            games_df[side + "_made_free_throws"] = made_ft
+            games_df[side + "_attempted_free_throws"] = attempted_ft
+            for col, mean in zip(_count_cols, _count_means):
+                games_df[side + "_" + col] = self.rng.poisson(mean, n_games)
+            games_df[side + "_minutes_played"] = 240
+
+        # Points as checked by the schedule merge
+        for side in ["away", "home"]:
+            games_df[side + "_score"] = games_df[side + "_made_free_throws"] \
+                + 2*games_df[side + "_made_field_goals"] \
+                + games_df[side + "_made_three_point_field_goals"]
+
+        # Breaks ties with one extra made free throw for the home team
+        is_tie = games_df["away_score"] == games_df["home_score"]
+        for col in ["home_made_free_throws", "home_attempted_free_throws", \
+                    "home_score"]:
+            games_df.loc[is_tie, col] = games_df.loc[is_tie, col] + 1
+
+        # Late games start after midnight UTC of the next day
+        start_hours = self.rng.choice(_start_hours, n_games)
+        games_df["start_time"] = pd.to_datetime(games_df["game_date"]) \
+                                 + pd.to_timedelta(start_hours, unit="h")
+        return games_df
+
+
+    def __write_season(self, season_str, games_df):
+        # Season schedule in game time order
+        sch_df = pd.DataFrame({"start_time": games_df["start_time"] \
+                                             .dt.tz_localize("UTC"), \
+                               "away_team": self.teams[games_df["away_idx"]], \
+                               "away_team_score": games_df["away_score"], \
+                               "home_team": self.teams[games_df["home_idx"]], \
+                               "home_team_score": games_df["home_score"]})
+        sch_df = sch_df.sort_values("start_time", kind="stable")
+        sch_df.to_csv(self.season_file_path + season_str + "_season_schedule.csv", \
+                      index=False)
+
+        # One team box score row per team and game, away team first
+        team_dfs = []
+        for side, opp_side in [("away", "home"), ("home", "away")]:
+            team_df = pd.DataFrame({"team": self.teams[games_df[side + "_idx"]]})
+            for col in _team_cols[1:]:
+                team_df[col] = games_df[side + "_" + col].to_numpy()
+            team_df["game_date"] = games_df["game_date"].to_numpy()
+            team_df["team_idx"] = games_df[side + "_idx"].to_numpy()
+            team_df["location"] = side.upper()
+            team_df["opponent"] = self.teams[games_df[opp_side + "_idx"]]
+            team_df["outcome"] = np.where(games_df[side + "_score"] \
+                                          > games_df[opp_side + "_score"], \
+                                          "WIN", "LOSS")
+            team_df["idx_game"] = np.arange(games_df.shape[0])
+            team_dfs.append(team_df)
+        team_season_df = pd.concat(team_dfs, ignore_index=True) \
+                           .sort_values(["idx_game", "location"], \
+                                        ascending=[True, True], kind="stable")
+
+        if not os.path.exists(self.team_file_path + season_str):
+            os.mkdir(self.team_file_path + season_str)
+        for game_date, team_df in team_season_df.groupby("game_date", sort=True):
+            team_df.loc[:, _team_cols].to_csv(self.team_file_path + season_str \
+                + "/" + game_date.strftime("%Y_%m_%d") + "_team_box_scores.csv", \
+                index=False)
+
+        if self.write_player_box_scores:
+            player_season_df = self.__get_player_box_scores(team_season_df)
+            if not os.path.exists(self.player_file_path + season_str):
+                os.mkdir(self.player_file_path + season_str)
+            for game_date, player_df in player_season_df.groupby("game_date", \
+                                                                 sort=True):
+                player_df.drop(columns=["game_date"]).to_csv(\
+                    self.player_file_path + season_str + "/" \
+                    + game_date.strftime("%Y_%m_%d") + "_player_box_scores.csv", \
+                    index=False)
+
+
+    def __get_player_box_scores(self, team_season_df):
+        # Splits each team box score among its players by roster weight
+        n_rows = team_season_df.shape[0]
+        weights = self.player_weights[team_season_df["team_idx"].to_numpy()]
+        stats = {}
+        made_attempted = [("made_field_goals", "attempted_field_goals"), \
+                          ("made_three_point_field_goals", \
+                           "attempted_three_point_field_goals"), \
+                          ("made_free_throws", "attempted_free_throws")]
+        for made_col, attempted_col in made_attempted:
+            made = team_season_df[made_col].to_numpy()
+            missed = team_season_df[attempted_col].to_numpy() - made
+            stats[made_col] = self.__split_counts(made, weights)
+            stats[attempted_col] = stats[made_col] \
+                                   + self.__split_counts(missed, weights)
+
+        # Three pointers are part of field goals for every player
+        three_made = stats["made_three_point_field_goals"]
+        three_missed = stats["attempted_three_point_field_goals"] - three_made
+        two_made = self.__split_counts(team_season_df["made_field_goals"] \
+                                       .to_numpy() \
+                                       - team_season_df["made_three_point_field_goals"] \
+                                       .to_numpy(), weights)
+        two_missed = self.__split_counts((team_season_df["attempted_field_goals"] \
+                                          - team_season_df["made_field_goals"] \
+                                          - team_season_df["attempted_three_point_field_goals"] \
+                                          + team_season_df["made_three_point_field_goals"]) \
+                                         .to_numpy(), weights)
+        stats["made_field_goals"] = two_made + three_made
+        stats["attempted_field_goals"] = two_made + two_missed \
+                                         + three_made + three_missed
+        for col in _count_cols:
+            stats[col] = self.__split_counts(team_season_df[col].to_numpy(), \
+                                             weights)
+        seconds = self.__split_counts(team_season_df["minutes_played"].to_numpy()*60, \
+                                      weights)
+
+        n_players = self.players_per_team
+        team_str = np.char.zfill((np.repeat(team_season_df["team_idx"] \
+                                            .to_numpy(), n_players) + 1) \
+                                 .astype(str), 3)
+        player_str = np.char.zfill((np.tile(np.arange(n_players), n_rows) + 1) \
+                                   .astype(str), 2)
+        player_id = np.char.add(np.char.add(team_str, "-"), player_str)
+        player_df = pd.DataFrame({"slug": np.char.add("synth", \
+                                                      np.char.replace(player_id, \
+                                                                      "-", "")), \
+                                  "name": np.char.add("Synthetic Player ", player_id), \
+                                  "team": np.repeat(team_season_df["team"] \
+                                                    .to_numpy(), n_players), \
+                                  "location": np.repeat(team_season_df["location"] \
+                                                        .to_numpy(), n_players), \
+                                  "opponent": np.repeat(team_season_df["opponent"] \
+                                                        .to_numpy(), n_players), \
+                                  "outcome": np.repeat(team_season_df["outcome"] \
+                                                       .to_numpy(), n_players), \
+                                  "seconds_played": seconds.ravel()})
+        for col in _team_cols[2:]:
+            player_df[col] = stats[col].ravel()
+
+        # Player game score as defined by basketball-reference
+        pts = player_df["made_free_throws"] + 2*player_df["made_field_goals"] \
+              + player_df["made_three_point_field_goals"]
+        player_df["game_score"] = (pts + 0.4*player_df["made_field_goals"] \
+            - 0.7*player_df["attempted_field_goals"] \
+            - 0.4*(player_df["attempted_free_throws"] - player_df["made_free_throws"]) \
+            + 0.7*player_df["offensive_rebounds"] + 0.3*player_df["defensive_rebounds"] \
+            + player_df["steals"] + 0.7*player_df["assists"] + 0.7*player_df["blocks"] \
+            - 0.4*player_df["personal_fouls"] - player_df["turnovers"]).round(1)
+        player_df["game_date"] = np.repeat(team_season_df["game_date"].to_numpy(), \
+                                           n_players)
+        return player_df
+
+
+    def __split_counts(self, counts, weights):
+        return self.rng.multinomial(counts, weights)
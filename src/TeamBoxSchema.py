@@ -0,0 +1,128 @@
+"""
+`TeamBoxSchema` class declares the in-memory types of processed team
+box scores, applied by `DataProcessor` when the complete data set is
+built and by `DataClassifier.load_data`.
+
+Attributes:
+    apply(team_df): Returns `team_df` with the declared types.
+        Columns not in `team_df` are skipped, and other columns are
+        kept as they are.
+
+    Types:
+        team, opponent: categorical with shared categories (missing
+            teams stay missing)
+        location: categorical ("away", "home")
+        box score counts: int8, or int16 for counts that can exceed
+            127 (minutes, attempts, rebounds and scores)
+        percentages: float32
+        game_date: datetime64[ns]
+        outcome: int8 label, 1 for win and 0 for loss (nullable Int8
+            with missing outcomes when there are any)
+        season: int16 season start year
+        playoffs: bool (nullable boolean with missing flags when there
+            are any)
+
+    Counts with missing values are stored as float32, and counts
+    outside the declared range as the next wider integer type.
+    The csv files keep their original text format.
+
+    Requirements:
+        pandas, numpy
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class TeamBoxSchema:
+    count_dtypes = {"minutes_played": np.int16, \
+                    "made_field_goals": np.int8, \
+                    "attempted_field_goals": np.int16, \
+                    "made_three_point_field_goals": np.int8, \
+                    "attempted_three_point_field_goals": np.int16, \
+                    "made_free_throws": np.int8, \
+                    "attempted_free_throws": np.int8, \
+                    "offensive_rebounds": np.int8, \
+                    "defensive_rebounds": np.int8, \
+                    "assists": np.int8, \
+                    "steals": np.int8, \
+                    "blocks": np.int8, \
+                    "turnovers": np.int8, \
+                    "personal_fouls": np.int8, \
+                    "game_score": np.int16, \
+                    "opponent_score": np.int16, \
+                    "total_rebounds": np.int16, \
+                    "season": np.int16}
+    float_cols = ["field_goal_percentage", "three_point_percentage"]
+    team_cols = ["team", "opponent"]
+    locations = ["away", "home"]
+
+
+    @staticmethod
+    def apply(team_df):
+        team_df = team_df.copy()
+        cols = set(team_df.columns)
+
+        # Teams and opponents share categories so they can be compared,
+        # and missing teams stay missing
+        team_cols = [col for col in TeamBoxSchema.team_cols if col in cols]
+        if team_cols:
+            teams = pd.concat([team_df[col].astype(object) \
+                               for col in team_cols]).dropna()
+            team_dtype = pd.CategoricalDtype(sorted(pd.unique(teams)))
+            for col in team_cols:
+                team_df[col] = team_df[col].astype(object).astype(team_dtype)
+        if "location" in cols:
+            team_df["location"] = team_df["location"].astype(\
+                pd.CategoricalDtype(TeamBoxSchema.locations))
+
+        for col, dtype in TeamBoxSchema.count_dtypes.items():
+            if col in cols:
+                team_df[col] = TeamBoxSchema.__cast_count(team_df[col], dtype)
+        for col in TeamBoxSchema.float_cols:
+            if col in cols:
+                team_df[col] = team_df[col].astype(np.float32)
+        if "game_date" in cols:
+            team_df["game_date"] = pd.to_datetime(team_df["game_date"]) \
+                                     .astype("datetime64[ns]")
+        if "outcome" in cols:
+            team_df["outcome"] = TeamBoxSchema.__cast_outcome(team_df["outcome"])
+        if "playoffs" in cols:
+            team_df["playoffs"] = TeamBoxSchema.__cast_playoffs(team_df["playoffs"])
+        return team_df
+
+
+    @staticmethod
+    def __cast_playoffs(values):
+        # Missing playoff flags stay missing (nullable boolean) instead
+        # of counting as playoff games
+        if values.isna().any():
+            return values.astype("boolean")
+        return values.astype(bool)
+
+
+    @staticmethod
+    def __cast_outcome(values):
+        # Missing outcomes stay missing (nullable Int8) instead of
+        # counting as losses
+        is_missing = values.isna()
+        if values.dtype.kind not in "biuf":
+            values = values.eq("win").astype(np.int8)
+        if is_missing.any():
+            return values.astype("Int8").mask(is_missing)
+        return values.astype(np.int8)
+
+
+    @staticmethod
+    def __cast_count(values, dtype):
+        if values.isna().any():
+            return values.astype(np.float32)
+        if values.shape[0] > 0:
+            for wider_dtype in [dtype, np.int16, np.int32, np.int64]:
+                if np.dtype(wider_dtype).itemsize < np.dtype(dtype).itemsize:
+                    continue
+                info = np.iinfo(wider_dtype)
+                if info.min <= values.min() and values.max() <= info.max:
+                    dtype = wider_dtype
+                    break
+        return values.astype(dtype)
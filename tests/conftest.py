@@ -0,0 +1,88 @@
+import os
+import sys
+import datetime
+import threading
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.DataProcessor import DataProcessor
+from src.StageInstrumentation import StageInstrumentation
+
+
+class FakeScrapeClient:
+    # Scraper client writing small csv files instead of requesting
+    # basketball-reference.  Counts calls, and fails the first
+    # `n_failures` calls for each date in `failing_dates`
+    def __init__(self, game_dates = (), failing_dates = (), n_failures = 0):
+        self.game_dates = set(game_dates)
+        self.failing_dates = set(failing_dates)
+        self.n_failures = n_failures
+        self.calls = []
+        self.lock = threading.Lock()
+
+
+    def team_box_scores(self, day, month, year, output_type, output_file_path):
+        self.__write_day("team_box_scores", datetime.date(year, month, day), \
+                         output_file_path)
+
+
+    def player_box_scores(self, day, month, year, output_type, output_file_path):
+        self.__write_day("player_box_scores", datetime.date(year, month, day), \
+                         output_file_path)
+
+
+    def season_schedule(self, season_end_year, output_type, output_file_path):
+        self.__add_call(("season_schedule", season_end_year))
+        write_schedule(output_file_path, \
+                       [date for date in self.game_dates \
+                        if datetime.date(season_end_year - 1, 7, 1) <= date \
+                        <= datetime.date(season_end_year, 6, 30)])
+
+
+    def get_calls(self, endpoint):
+        with self.lock:
+            return [call[1] for call in self.calls if call[0] == endpoint]
+
+
+    def __add_call(self, call):
+        with self.lock:
+            self.calls.append(call)
+            return self.calls.count(call)
+
+
+    def __write_day(self, endpoint, date, output_file_path):
+        n_calls = self.__add_call((endpoint, date))
+        if date in self.failing_dates and n_calls <= self.n_failures:
+            raise ConnectionError("Fake failure for " + str(date))
+        with open(output_file_path, "w") as f:
+            f.write("team,outcome\n")
+            if date in self.game_dates:
+                f.write("BOSTON CELTICS,WIN\n")
+
+
+def write_schedule(file_path, game_dates, date_saved = None):
+    # Games start at 23:00 UTC, so they belong to the same game date
+    with open(file_path, "w") as f:
+        f.write("start_time,away_team,away_team_score,home_team,home_team_score\n")
+        for date in sorted(game_dates):
+            f.write(date.strftime("%Y-%m-%d") + " 23:00:00+00:00," \
+                    + "BOSTON CELTICS,100,ATLANTA HAWKS,90\n")
+    if date_saved is not None:
+        timestamp = datetime.datetime(date_saved.year, date_saved.month, \
+                                      date_saved.day).timestamp()
+        os.utime(file_path, (timestamp, timestamp))
+
+
+@pytest.fixture
+def make_processor(tmp_path):
+    def make(client, date_today, **kwargs):
+        data_processor = DataProcessor(root_dir=str(tmp_path / "data_raw"), \
+                                       proc_dir=str(tmp_path / "data_preprocessed"), \
+                                       scrape_client=client, \
+                                       max_requests_per_second=None, \
+                                       instrumentation=StageInstrumentation(verbosity=0), \
+                                       **kwargs)
+        data_processor.date_today = date_today
+        return data_processor
+    return make
@@ -0,0 +1,64 @@
+import pickle
+import threading
+import urllib.error
+import pytest
+import numpy as np
+from src.PredictionService import PredictionService, PredictionClient
+
+
+class FakeModel:
+    # Win probability is the first feature; negative features fail
+    classes_ = [0, 1]
+
+    def __init__(self):
+        self.batch_sizes = []
+
+
+    def predict_proba(self, X):
+        self.batch_sizes.append(X.shape[0])
+        if (X < 0).any():
+            raise ValueError("Negative feature.")
+        return np.column_stack([1 - X[:, 0], X[:, 0]])
+
+
+@pytest.fixture
+def service(tmp_path):
+    model_path = str(tmp_path / "model.pkl")
+    with open(model_path, "wb") as f:
+        pickle.dump({"name": "fake", "model": FakeModel(), \
+                     "feats": ["a", "b"]}, f)
+    service = PredictionService(model_path, port=0, max_wait_ms=500)
+    service.start()
+    yield service
+    service.stop()
+
+
+def test_bad_request_in_micro_batch(service):
+    client = PredictionClient(*service.server.server_address)
+    games = [[[0.25, 1.0]], [[0.5, -1.0]], [{"a": 0.75, "b": 1.0}]]
+    results = [None]*len(games)
+
+    def predict(idx):
+        try:
+            results[idx] = client.predict(games[idx])
+        except urllib.error.HTTPError as error:
+            results[idx] = error.code
+
+    threads = [threading.Thread(target=predict, args=(idx,)) \
+               for idx in range(len(games))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # One failed batch, then each request on its own
+    assert service.model.batch_sizes == [3, 1, 1, 1]
+    assert results == [[0.25], 400, [0.75]]
+    assert client.get_latency_stats()["count"] == 2
+
+
+def test_non_finite_features_are_rejected(service):
+    client = PredictionClient(*service.server.server_address)
+    with pytest.raises(urllib.error.HTTPError) as error:
+        client.predict([[float("nan"), 1.0]])
+    assert error.value.code == 400
+    assert client.predict([[0.5, 1.0], [0.125, 1.0]]) == [0.5, 0.125]
@@ -0,0 +1,59 @@
+import datetime
+from conftest import FakeScrapeClient, write_schedule
+
+# Only the 1999-2000 season is scraped on this date
+date_today = datetime.date(2000, 9, 1)
+game_dates = [datetime.date(1999, 11, 2), datetime.date(1999, 11, 3), \
+              datetime.date(2000, 4, 19)]
+
+
+def get_schedule_path(data_processor):
+    return data_processor.season_file_path + "1999_2000_season_schedule.csv"
+
+
+def test_requests_only_scheduled_dates(make_processor):
+    client = FakeScrapeClient(game_dates)
+    data_processor = make_processor(client, date_today)
+    write_schedule(get_schedule_path(data_processor), game_dates)
+
+    data_processor.scrape_data_team_box_scores()
+    assert sorted(client.get_calls("team_box_scores")) == game_dates
+
+
+def test_final_schedule_on_disk_completes_season(make_processor):
+    # Schedule saved after the season ended, without a cache entry
+    client = FakeScrapeClient(game_dates)
+    data_processor = make_processor(client, date_today)
+    write_schedule(get_schedule_path(data_processor), game_dates)
+
+    data_processor.scrape_data_team_box_scores()
+    manifest = data_processor.manifest
+    assert manifest.get("scrape_team_box_scores", "1999_2000") is not None
+    assert manifest.get("scrape_season_schedule", "1999_2000") is not None
+    assert manifest.get("scrape_team_box_scores", "1999_2000/1999_11_04") \
+           is not None
+
+    data_processor = make_processor(client, date_today)
+    data_processor.scrape_data_team_box_scores()
+    assert len(client.get_calls("team_box_scores")) == len(game_dates)
+
+
+def test_stale_schedule_off_days_are_checked_again(make_processor):
+    # Schedule saved before the playoff dates were added
+    client = FakeScrapeClient(game_dates)
+    data_processor = make_processor(client, date_today)
+    write_schedule(get_schedule_path(data_processor), game_dates[:2], \
+                   date_saved=datetime.date(2000, 1, 15))
+
+    data_processor.scrape_data_team_box_scores()
+    manifest = data_processor.manifest
+    assert sorted(client.get_calls("team_box_scores")) == game_dates[:2]
+    assert manifest.get("scrape_team_box_scores", "1999_2000") is None
+    assert manifest.get("scrape_team_box_scores", "1999_2000/2000_04_19") \
+           is None
+
+    write_schedule(get_schedule_path(data_processor), game_dates, \
+                   date_saved=datetime.date(2000, 1, 15))
+    data_processor = make_processor(client, date_today)
+    data_processor.scrape_data_team_box_scores()
+    assert sorted(client.get_calls("team_box_scores")) == game_dates
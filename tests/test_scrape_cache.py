@@ -0,0 +1,112 @@
+import os
+import shutil
+import datetime
+import threading
+import http.server
+from conftest import FakeScrapeClient, write_schedule
+from src.ScrapeCache import ScrapeCache
+
+# Only the 1999-2000 season is scraped on this date
+date_today = datetime.date(2000, 9, 1)
+game_dates = [datetime.date(1999, 11, 2), datetime.date(1999, 11, 3)]
+
+
+def test_final_and_fresh_responses(tmp_path):
+    scrape_cache = ScrapeCache(str(tmp_path / "scrape_cache"))
+    file_path = str(tmp_path / "response.csv")
+    with open(file_path, "w") as f:
+        f.write("team,outcome\n")
+    today = datetime.date.today()
+
+    # Responses fetched after their final date can no longer change
+    assert scrape_cache.save("team_box_scores", "old", file_path, \
+                             today - datetime.timedelta(days=4))
+    assert not scrape_cache.save("team_box_scores", "recent", file_path, today)
+    assert scrape_cache.is_final("team_box_scores", "old")
+    assert not scrape_cache.is_final("team_box_scores", "recent")
+    assert os.path.isfile(str(tmp_path / "scrape_cache" / "team_box_scores" \
+                              / "old.csv.gz"))
+
+    output_file_path = str(tmp_path / "output.csv")
+    assert scrape_cache.load("team_box_scores", "recent", output_file_path)
+    with open(output_file_path) as f:
+        assert f.read() == "team,outcome\n"
+
+    # Responses that can still change are only fresh for `max_age`
+    scrape_cache.max_age = datetime.timedelta(0)
+    assert not scrape_cache.load("team_box_scores", "recent", output_file_path)
+    assert scrape_cache.load("team_box_scores", "old", output_file_path)
+    assert not scrape_cache.load("team_box_scores", "missing", output_file_path)
+
+
+def test_rebuild_is_served_from_cache(make_processor, tmp_path):
+    client = FakeScrapeClient(game_dates)
+    data_processor = make_processor(client, date_today)
+    write_schedule(data_processor.season_file_path \
+                   + "1999_2000_season_schedule.csv", game_dates)
+    data_processor.scrape_data_team_box_scores()
+    assert len(client.get_calls("team_box_scores")) == 2
+
+    # Removes raw files and the manifest, keeping the cache
+    shutil.rmtree(str(tmp_path / "data_preprocessed"))
+    shutil.rmtree(data_processor.team_file_path)
+    data_processor = make_processor(client, date_today)
+    data_processor.scrape_data_team_box_scores()
+    assert len(client.get_calls("team_box_scores")) == 2
+    assert sorted(os.listdir(data_processor.team_file_path + "1999_2000")) \
+           == ["1999_11_02_team_box_scores.csv", "1999_11_03_team_box_scores.csv"]
+
+
+def test_unsettled_days_are_requested_again(make_processor):
+    # Days are never settled, so they stay out of the manifest
+    client = FakeScrapeClient(game_dates)
+    data_processor = make_processor(client, date_today, \
+                                    scrape_settle_days=100000)
+    write_schedule(data_processor.season_file_path \
+                   + "1999_2000_season_schedule.csv", game_dates)
+    data_processor.scrape_data_team_box_scores()
+    assert data_processor.manifest.get("scrape_team_box_scores", \
+                                       "1999_2000/1999_11_02") is None
+
+    # Served from the cache while fresh, then requested again
+    data_processor = make_processor(client, date_today, \
+                                    scrape_settle_days=100000)
+    data_processor.scrape_data_team_box_scores()
+    assert len(client.get_calls("team_box_scores")) == 2
+    data_processor.scrape_cache.max_age = datetime.timedelta(0)
+    data_processor.scrape_data_team_box_scores()
+    assert len(client.get_calls("team_box_scores")) == 4
+
+
+class FakeServerHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b"<html><body></body></html>")
+
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_scraper_requests_local_server(make_processor):
+    from basketball_reference_web_scraper.http_service import HTTPService
+    base_url = HTTPService.BASE_URL
+    server = http.server.HTTPServer(("127.0.0.1", 0), FakeServerHandler)
+    server.paths = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        data_processor = make_processor(None, date_today, \
+                                        scrape_base_url="http://127.0.0.1:" \
+                                        + str(server.server_port))
+        write_schedule(data_processor.season_file_path \
+                       + "1999_2000_season_schedule.csv", game_dates)
+        data_processor.scrape_data_player_box_scores()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert sorted(server.paths) \
+           == ["/friv/dailyleaders.cgi?month=11&day=2&year=1999", \
+               "/friv/dailyleaders.cgi?month=11&day=3&year=1999"]
+    assert HTTPService.BASE_URL == base_url
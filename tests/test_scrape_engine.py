@@ -0,0 +1,79 @@
+import time
+import datetime
+from conftest import FakeScrapeClient, write_schedule
+from src.ScrapeEngine import ScrapeEngine, TokenBucket
+from src.StageInstrumentation import StageInstrumentation
+
+date = datetime.date(2019, 11, 1)
+
+
+def fetch_day(engine, tmp_path):
+    def task(date):
+        engine.fetch("team_box_scores", day=date.day, month=date.month, \
+                     year=date.year, output_type=None, \
+                     output_file_path=str(tmp_path / "day.csv"))
+        return date
+    return task
+
+
+def test_retries_with_backoff(tmp_path):
+    client = FakeScrapeClient([date], failing_dates=[date], n_failures=2)
+    engine = ScrapeEngine(client, requests_per_second=None, max_retries=2, \
+                          backoff_seconds=0.05, \
+                          instrumentation=StageInstrumentation(verbosity=0))
+    time_start = time.perf_counter()
+    results, failed_items = engine.run([date], fetch_day(engine, tmp_path))
+    assert time.perf_counter() - time_start >= 0.05 + 0.1
+    assert results == [date]
+    assert failed_items == []
+    assert len(client.get_calls("team_box_scores")) == 3
+
+
+def test_failed_items_are_logged(tmp_path, capsys):
+    dates = [date, date + datetime.timedelta(days=1)]
+    client = FakeScrapeClient(dates, failing_dates=[date], n_failures=10)
+    engine = ScrapeEngine(client, requests_per_second=None, max_retries=1, \
+                          backoff_seconds=0.0, \
+                          instrumentation=StageInstrumentation(verbosity=1))
+    results, failed_items = engine.run(dates, fetch_day(engine, tmp_path))
+    assert results == [None, dates[1]]
+    assert failed_items == [date]
+    assert client.get_calls("team_box_scores").count(date) == 2
+    assert "FAILED TO SCRAPE " + str(date) in capsys.readouterr().out
+
+    engine.instrumentation.verbosity = 0
+    engine.run([date], fetch_day(engine, tmp_path))
+    assert capsys.readouterr().out == ""
+
+
+def test_token_bucket_rate():
+    token_bucket = TokenBucket(rate=50, capacity=1)
+    time_start = time.perf_counter()
+    for idx in range(11):
+        token_bucket.acquire()
+    assert time.perf_counter() - time_start >= 10/50*0.9
+
+
+def test_failed_days_are_requested_again(make_processor):
+    # Only the 1999-2000 season is scraped on this date
+    date_today = datetime.date(2000, 9, 1)
+    game_dates = [datetime.date(1999, 11, 2), datetime.date(1999, 11, 3)]
+    client = FakeScrapeClient(game_dates, failing_dates=game_dates[:1], \
+                              n_failures=1)
+    data_processor = make_processor(client, date_today, max_scrape_retries=0)
+    data_processor.scrape_engine.backoff_seconds = 0.0
+    write_schedule(data_processor.season_file_path \
+                   + "1999_2000_season_schedule.csv", game_dates)
+
+    data_processor.scrape_data_team_box_scores()
+    manifest = data_processor.manifest
+    assert manifest.get("scrape_team_box_scores", "1999_2000") is None
+    assert manifest.get("scrape_team_box_scores", "1999_2000/1999_11_02") \
+           is None
+
+    data_processor = make_processor(client, date_today)
+    data_processor.scrape_data_team_box_scores()
+    assert sorted(client.get_calls("team_box_scores")) \
+           == [game_dates[0], game_dates[0], game_dates[1]]
+    assert data_processor.manifest.get("scrape_team_box_scores", "1999_2000") \
+           is not None